@@ -1,5 +1,10 @@
 import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
+from itertools import islice
 from typing import Dict, Any, List, Optional, Callable
 from dataclasses import dataclass, field
 from enum import Enum
@@ -7,6 +12,32 @@ import uuid
 from loguru import logger
 import json
 
+# Ring buffer capacities; the oldest entries are overwritten in O(1) once full
+MESSAGE_HISTORY_SIZE = int(os.getenv("RAG_MESSAGE_HISTORY_SIZE", "1000"))
+ACTIVITY_LOG_SIZE = int(os.getenv("RAG_ACTIVITY_LOG_SIZE", "100"))
+AGENT_INBOX_SIZE = int(os.getenv("RAG_AGENT_INBOX_SIZE", "100"))
+
+# Shared data limits: entry count, approximate total bytes, time to live and the
+# size above which a value is replaced by a summary
+SHARED_DATA_MAX_ENTRIES = int(os.getenv("RAG_SHARED_DATA_MAX_ENTRIES", "1000"))
+SHARED_DATA_MAX_BYTES = int(os.getenv("RAG_SHARED_DATA_MAX_BYTES", str(16 * 1024 * 1024)))
+SHARED_DATA_TTL = float(os.getenv("RAG_SHARED_DATA_TTL", "3600"))
+SHARED_DATA_INLINE_BYTES = int(os.getenv("RAG_SHARED_DATA_INLINE_BYTES", "4096"))
+
+# SimpleMessageBus dispatch: per-agent queue capacity, what to do when it is full
+# ("drop" the new message or "backpressure" the sender) and request/response timeout
+BUS_QUEUE_SIZE = int(os.getenv("RAG_BUS_QUEUE_SIZE", "1000"))
+BUS_FULL_POLICY = os.getenv("RAG_BUS_FULL_POLICY", "drop")
+BUS_REQUEST_TIMEOUT = float(os.getenv("RAG_BUS_REQUEST_TIMEOUT", "30"))
+
+def tail(buffer: deque, limit: int) -> List:
+    """Last `limit` entries of a ring buffer in insertion order, without copying the rest"""
+    if limit <= 0:
+        return []
+    items = list(islice(reversed(buffer), limit))
+    items.reverse()
+    return items
+
 class MessageType(Enum):
     TASK_REQUEST = "task_request"
     TASK_RESPONSE = "task_response"
@@ -98,11 +129,11 @@ class SharedMemory:
 class MessageBus:
     """Central message bus for agent communication"""
     
-    def __init__(self):
+    def __init__(self, history_size: int = MESSAGE_HISTORY_SIZE):
         self.message_queues: Dict[str, asyncio.Queue] = {}
         self.agents: Dict[str, AgentInfo] = {}
         self.message_handlers: Dict[str, Dict[MessageType, Callable]] = {}
-        self.message_history: List[Message] = []
+        self.message_history: deque = deque(maxlen=history_size)
         self.shared_memory = SharedMemory()
     
     def register_agent(self, name: str, capabilities: List[str] = None):
@@ -134,10 +165,8 @@ class MessageBus:
                 self.agents[message.sender].message_count += 1
                 self.agents[message.sender].last_seen = datetime.now()
             
-            # Add to message history
+            # Add to message history (bounded ring buffer)
             self.message_history.append(message)
-            if len(self.message_history) > 1000:  # Keep last 1000 messages
-                self.message_history.pop(0)
             
             # Send to recipient's queue
             await self.message_queues[message.recipient].put(message)
@@ -228,7 +257,7 @@ class MessageBus:
     
     def get_message_history(self, limit: int = 100) -> List[Message]:
         """Get recent message history"""
-        return self.message_history[-limit:]
+        return tail(self.message_history, limit)
 
 # Global message bus instance
 message_bus = MessageBus()
@@ -446,12 +475,157 @@ async def get_system_status() -> Dict[str, Any]:
     
     return status
 
+def estimate_size(value: Any) -> int:
+    """Approximate payload size in bytes of JSON-like values (text dominates)"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(key)) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_size(item) for item in value)
+    if hasattr(value, "page_content"):
+        return len(value.page_content) + estimate_size(getattr(value, "metadata", {}))
+    return 8
+
+def summarize_value(value: Any, preview_chars: int = 200) -> Any:
+    """Replace bulky parts of a payload with short descriptions"""
+    if isinstance(value, dict):
+        return {key: summarize_value(item, preview_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return {"type": "list", "count": len(value), "bytes": estimate_size(value)}
+    if isinstance(value, bytes):
+        return {"type": "bytes", "bytes": len(value)}
+    if hasattr(value, "page_content"):
+        value = value.page_content
+    if isinstance(value, str) and len(value) > preview_chars:
+        return {
+            "type": "text",
+            "length": len(value),
+            "preview": value[:preview_chars],
+            "sha1": hashlib.sha1(value.encode("utf-8", "replace")).hexdigest()
+        }
+    return value
+
+class SharedDataStore:
+    """Bounded key/value store behind SimpleMessageBus.shared_data
+    
+    Entries expire after a TTL and the least recently written entries are evicted
+    once the entry count or approximate byte budget is exceeded. Values larger than
+    inline_bytes are stored as a summary (counts, lengths, previews) instead.
+    """
+    
+    def __init__(self, max_entries: int = SHARED_DATA_MAX_ENTRIES, max_bytes: int = SHARED_DATA_MAX_BYTES,
+                 ttl_seconds: float = SHARED_DATA_TTL, inline_bytes: int = SHARED_DATA_INLINE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.inline_bytes = inline_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.counters = {"sets": 0, "summarized": 0, "evictions": 0, "expirations": 0}
+    
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+    
+    def _expire(self):
+        # Every entry shares one TTL and writes move keys to the end, so expired entries are at the front
+        if self.ttl_seconds <= 0:
+            return
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["written_at"] <= self.ttl_seconds:
+                break
+            self._drop(key)
+            self.counters["expirations"] += 1
+    
+    def set(self, key: str, value: Any, agent_name: str = "system"):
+        """Store a value, summarizing it if it is large, and evict over capacity"""
+        size = estimate_size(value)
+        summarized = size > self.inline_bytes
+        if summarized:
+            value = summarize_value(value)
+            self.counters["summarized"] += 1
+        stored_size = estimate_size(value) if summarized else size
+        
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = {
+            "value": value,
+            "updated_by": agent_name,
+            "timestamp": datetime.now(),
+            "written_at": time.monotonic(),
+            "size": stored_size,
+            "original_size": size,
+            "summarized": summarized
+        }
+        self._bytes += stored_size
+        self.counters["sets"] += 1
+        
+        self._expire()
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+    
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the stored entry (value plus metadata) if present and not expired"""
+        self._expire()
+        return self._entries.get(key)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return entry["value"] if entry is not None else default
+    
+    def keys(self) -> List[str]:
+        self._expire()
+        return list(self._entries.keys())
+    
+    def page(self, prefix: str = "", offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Entries whose key starts with prefix, newest first, sliced without copying values"""
+        self._expire()
+        matching = (
+            (key, entry) for key, entry in reversed(self._entries.items())
+            if key.startswith(prefix)
+        )
+        items = list(islice(matching, offset, offset + max(0, limit)))
+        total = sum(1 for key in self._entries if key.startswith(prefix)) if prefix else len(self._entries)
+        return {"items": items, "total": total}
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get_entry(key) is not None
+    
+    def __len__(self) -> int:
+        self._expire()
+        return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        self._expire()
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
 class SimpleMessageBus:
-    """Simple message bus for basic agent communication"""
+    """Simple message bus for basic agent communication
     
-    def __init__(self):
+    Messages to an agent with a handler go through that agent's bounded queue and
+    are handled in order by a worker task, so senders never wait on the handler.
+    """
+    
+    def __init__(self, inbox_size: int = AGENT_INBOX_SIZE, queue_size: int = BUS_QUEUE_SIZE,
+                 full_policy: str = BUS_FULL_POLICY):
         self.agents = {}
-        self.shared_data = {}
+        self.shared_data = SharedDataStore()
+        self.inbox_size = inbox_size
+        self.queue_size = queue_size
+        self.full_policy = full_policy
+        # agent name -> {"queue", "task", "loop"}, created on first send inside a running loop
+        self._dispatch: Dict[str, Dict[str, Any]] = {}
         # Register a system coordinator by default
         self.register_agent("system")
     
@@ -460,58 +634,155 @@ class SimpleMessageBus:
         self.agents[name] = {
             "status": "idle",
             "handler": handler_func,
-            "messages": []
+            "messages": deque(maxlen=self.inbox_size),
+            "stats": {"delivered": 0, "dropped": 0, "errors": 0, "max_depth": 0, "handler_seconds": 0.0}
         }
+        previous = self._dispatch.pop(name, None)
+        if previous:
+            previous["task"].cancel()
         logger.info(f"Registered agent: {name}")
     
-    async def send_message(self, from_agent: str, to_agent: str, message_type: str, data: dict):
-        """Send a simple message between agents"""
+    def _queue_for(self, name: str) -> asyncio.Queue:
+        """Get the agent's dispatch queue, starting its worker on the running loop if needed"""
+        loop = asyncio.get_running_loop()
+        dispatch = self._dispatch.get(name)
+        if dispatch is None or dispatch["loop"] is not loop or dispatch["task"].done():
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            dispatch = {
+                "queue": queue,
+                "task": loop.create_task(self._worker(name, queue)),
+                "loop": loop
+            }
+            self._dispatch[name] = dispatch
+        return dispatch["queue"]
+    
+    async def _worker(self, name: str, queue: asyncio.Queue):
+        while True:
+            message, reply = await queue.get()
+            agent = self.agents.get(name)
+            if agent is None or agent["handler"] is None:
+                # Removed (or re-registered without a handler) while the message was queued
+                logger.warning(f"Message dropped: {name} has no handler anymore ({message['type']})")
+                if reply is not None and not reply.done():
+                    reply.set_exception(RuntimeError(f"Agent {name} has no handler to process the message"))
+                queue.task_done()
+                continue
+            started = time.perf_counter()
+            try:
+                result = await agent["handler"](message)
+                agent["stats"]["delivered"] += 1
+                if reply is not None and not reply.done():
+                    reply.set_result(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                agent["stats"]["errors"] += 1
+                logger.error(f"Error in handler for {name}: {e}")
+                if reply is not None and not reply.done():
+                    reply.set_exception(e)
+            finally:
+                agent["stats"]["handler_seconds"] += time.perf_counter() - started
+                queue.task_done()
+    
+    async def _enqueue(self, from_agent: str, to_agent: str, message_type: str, data: dict,
+                       reply: Optional[asyncio.Future] = None, block: bool = False) -> bool:
         if to_agent not in self.agents:
             # Instead of error, just log and ignore messages to non-existent agents
             logger.debug(f"Message ignored: {to_agent} not found (from {from_agent})")
             return False
         
+        agent = self.agents[to_agent]
         message = {
             "from": from_agent,
             "type": message_type,
             "data": data,
             "timestamp": datetime.now()
         }
+        agent["messages"].append(message)
         
-        self.agents[to_agent]["messages"].append(message)
+        if agent["handler"] is None:
+            if reply is not None:
+                reply.set_result(None)
+            return True
         
-        # Call handler if available
-        if self.agents[to_agent]["handler"]:
-            try:
-                await self.agents[to_agent]["handler"](message)
-            except Exception as e:
-                logger.error(f"Error in handler for {to_agent}: {e}")
+        queue = self._queue_for(to_agent)
+        if queue.full() and not block and self.full_policy != "backpressure":
+            agent["stats"]["dropped"] += 1
+            logger.debug(f"Message dropped: {to_agent} queue full (from {from_agent}, {message_type})")
+            return False
+        # Only waits when the queue is full and the sender accepts backpressure
+        await queue.put((message, reply))
+        agent["stats"]["max_depth"] = max(agent["stats"]["max_depth"], queue.qsize())
         
         logger.debug(f"Message sent: {from_agent} -> {to_agent} ({message_type})")
         return True
     
+    async def send_message(self, from_agent: str, to_agent: str, message_type: str, data: dict):
+        """Send a fire-and-forget message; returns once it is queued, not handled"""
+        return await self._enqueue(from_agent, to_agent, message_type, data)
+    
+    async def request(self, from_agent: str, to_agent: str, message_type: str, data: dict,
+                      timeout: float = BUS_REQUEST_TIMEOUT) -> Any:
+        """Send a message and wait for the recipient handler's return value
+        
+        The caller is already waiting on the reply, so a full queue applies
+        backpressure here regardless of the drop policy.
+        """
+        reply = asyncio.get_running_loop().create_future()
+        if not await self._enqueue(from_agent, to_agent, message_type, data, reply, block=True):
+            raise RuntimeError(f"Message to {to_agent} was not delivered")
+        return await asyncio.wait_for(reply, timeout)
+    
+    def get_queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth and delivery counters per agent"""
+        stats = {}
+        for name, agent in self.agents.items():
+            dispatch = self._dispatch.get(name)
+            counters = agent["stats"]
+            handled = counters["delivered"] + counters["errors"]
+            stats[name] = {
+                "depth": dispatch["queue"].qsize() if dispatch else 0,
+                "capacity": self.queue_size,
+                "policy": self.full_policy,
+                "delivered": counters["delivered"],
+                "dropped": counters["dropped"],
+                "errors": counters["errors"],
+                "max_depth": counters["max_depth"],
+                "avg_handler_ms": round(counters["handler_seconds"] / handled * 1000, 3) if handled else 0.0
+            }
+        return stats
+    
+    async def stop(self, drain_timeout: float = 5.0):
+        """Give queued messages a chance to be handled, then stop the workers"""
+        dispatches = list(self._dispatch.values())
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(dispatch["queue"].join() for dispatch in dispatches)),
+                timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Message bus stopped with undelivered messages")
+        for dispatch in dispatches:
+            dispatch["task"].cancel()
+        await asyncio.gather(*(dispatch["task"] for dispatch in dispatches), return_exceptions=True)
+        self._dispatch.clear()
+    
     def get_messages(self, agent_name: str):
         """Get all messages for an agent"""
         if agent_name in self.agents:
-            messages = self.agents[agent_name]["messages"].copy()
+            messages = list(self.agents[agent_name]["messages"])
             self.agents[agent_name]["messages"].clear()  # Clear after reading
             return messages
         return []
     
     def set_shared_data(self, key: str, value: Any, agent_name: str = "system"):
         """Set shared data"""
-        self.shared_data[key] = {
-            "value": value,
-            "updated_by": agent_name,
-            "timestamp": datetime.now()
-        }
+        self.shared_data.set(key, value, agent_name)
         logger.debug(f"Shared data set: {key} by {agent_name}")
     
     def get_shared_data(self, key: str, default=None):
         """Get shared data"""
-        if key in self.shared_data:
-            return self.shared_data[key]["value"]
-        return default
+        return self.shared_data.get(key, default)
     
     def update_agent_status(self, agent_name: str, status: str):
         """Update agent status"""
@@ -535,6 +806,11 @@ class SimpleAgent:
         """Send message to another agent"""
         return await self.bus.send_message(self.name, to_agent, message_type, data)
     
+    async def request(self, to_agent: str, message_type: str, data: dict,
+                      timeout: float = BUS_REQUEST_TIMEOUT) -> Any:
+        """Send a message and wait for the other agent's handler result"""
+        return await self.bus.request(self.name, to_agent, message_type, data, timeout)
+    
     def set_status(self, status: str):
         """Update agent status"""
         self.bus.update_agent_status(self.name, status)
@@ -550,9 +826,9 @@ class SimpleAgent:
 class SimpleCoordinator(SimpleAgent):
     """Simple system coordinator"""
     
-    def __init__(self):
+    def __init__(self, log_size: int = ACTIVITY_LOG_SIZE):
         super().__init__("system")
-        self.activity_log = []
+        self.activity_log: deque = deque(maxlen=log_size)
     
     async def handle_message(self, message):
         """Handle system messages and log activities"""
@@ -566,15 +842,11 @@ class SimpleCoordinator(SimpleAgent):
             }
             self.activity_log.append(activity)
             
-            # Keep only last 100 activities
-            if len(self.activity_log) > 100:
-                self.activity_log.pop(0)
-            
             logger.info(f"Activity logged: {activity['agent']} - {activity['activity']}")
     
     def get_recent_activities(self, limit=10):
         """Get recent activities"""
-        return self.activity_log[-limit:]
+        return tail(self.activity_log, limit)
 
 # Global simple message bus
 simple_bus = SimpleMessageBus()
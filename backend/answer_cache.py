@@ -0,0 +1,185 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+import numpy as np
+from loguru import logger
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s?!.]+$")
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[str]
+    n_results: int
+    embedding: Optional[np.ndarray] = None
+    citations: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+class AnswerCache:
+    """LRU/TTL answer cache with an exact tier and a semantic (embedding distance) tier"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600,
+                 semantic_distance: float = 0.05):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_distance = semantic_distance
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        # Stacked, normalized query embeddings for the semantic tier, rebuilt when entries change
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        # Bumped by invalidate(); answers computed under an older generation are not stored
+        self.generation = 0
+        self.counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_puts": 0
+        }
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        normalized = _WHITESPACE_RE.sub(" ", question.strip().lower())
+        return _TRAILING_PUNCTUATION_RE.sub("", normalized)
+
+    @staticmethod
+    def fingerprint(chunk_ids: List[str]) -> str:
+        """Fingerprint of the retrieved chunk ids in rank order"""
+        return hashlib.sha1("\x1f".join(chunk_ids).encode("utf-8")).hexdigest()
+
+    def make_key(self, question: str, chunk_ids: List[str], n_results: int) -> str:
+        """Build the exact-tier key"""
+        return f"{n_results}:{self.fingerprint(chunk_ids)}:{self.normalize_question(question)}"
+
+    def _is_expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl_seconds > 0 and time.time() - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._matrix = None
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        """Look up the exact tier"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.counters["misses"] += 1
+            return None
+        if self._is_expired(entry):
+            self._remove(key)
+            self.counters["expirations"] += 1
+            self.counters["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.counters["exact_hits"] += 1
+        return entry
+
+    def _build_matrix(self):
+        keys = [key for key, entry in self._entries.items() if entry.embedding is not None]
+        self._matrix_keys = keys
+        self._matrix = (
+            np.stack([self._entries[key].embedding for key in keys])
+            if keys else np.empty((0, 0), dtype=np.float32)
+        )
+
+    def get_semantic(self, query_embedding: List[float], n_results: int) -> Optional[CachedAnswer]:
+        """Look up the closest cached query within the configured cosine distance"""
+        if self.semantic_distance <= 0 or not self._entries:
+            return None
+        if self._matrix is None:
+            self._build_matrix()
+        if not self._matrix_keys:
+            return None
+
+        query = _normalize(query_embedding)
+        if query.shape[0] != self._matrix.shape[1]:
+            return None
+        distances = 1.0 - self._matrix @ query
+        for index in np.argsort(distances):
+            if distances[index] > self.semantic_distance:
+                break
+            key = self._matrix_keys[index]
+            entry = self._entries.get(key)
+            if entry is None or entry.n_results != n_results:
+                continue
+            if self._is_expired(entry):
+                self._remove(key)
+                self.counters["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.counters["semantic_hits"] += 1
+            return entry
+        return None
+
+    def put(self, key: str, answer: str, sources: List[str], n_results: int,
+            query_embedding: Optional[List[float]] = None,
+            citations: Optional[List[Dict[str, Any]]] = None, generation: Optional[int] = None):
+        """Store an answer, evicting least recently used entries over capacity
+
+        Without a query embedding the answer is only reachable through the exact tier.
+        Pass the generation read before retrieval: if the cache was invalidated since,
+        the answer may come from the old collection and is dropped.
+        """
+        if generation is not None and generation != self.generation:
+            self.counters["stale_puts"] += 1
+            return
+        self._entries[key] = CachedAnswer(
+            answer=answer,
+            sources=sources,
+            n_results=n_results,
+            embedding=_normalize(query_embedding) if query_embedding is not None else None,
+            citations=citations or []
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+        self._matrix = None
+
+    def invalidate(self, reason: str = ""):
+        """Drop every entry, e.g. after the collection changed"""
+        if self._entries:
+            logger.info(f"Answer cache invalidated ({len(self._entries)} entries): {reason}")
+        self._entries.clear()
+        self._matrix = None
+        self.generation += 1
+        self.counters["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and configuration"""
+        hits = self.counters["exact_hits"] + self.counters["semantic_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "semantic_distance": self.semantic_distance
+        }
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm > 0 else array
+
+def create_answer_cache() -> AnswerCache:
+    """Create an answer cache from environment configuration"""
+    return AnswerCache(
+        max_entries=int(os.getenv("RAG_ANSWER_CACHE_SIZE", "512")),
+        ttl_seconds=float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600")),
+        semantic_distance=float(os.getenv("RAG_ANSWER_CACHE_DISTANCE", "0.05"))
+    )
+
+# Global answer cache
+answer_cache = create_answer_cache()
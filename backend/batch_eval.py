@@ -0,0 +1,247 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator
+from loguru import logger
+from concurrency import POOL_SIZES, run_blocking
+
+class RunningStats:
+    """Incremental batch statistics (Welford mean/variance) over overall scores"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.errors = 0
+        self.partial = 0
+
+    def add(self, evaluation: Dict[str, Any]):
+        score = evaluation["overall_score"]
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (score - self.mean)
+        self.min = score if self.min is None else min(self.min, score)
+        self.max = score if self.max is None else max(self.max, score)
+        if evaluation.get("summary", {}).get("partial"):
+            self.partial += 1
+
+    def add_error(self):
+        self.errors += 1
+
+    def to_dict(self, total: int) -> Dict[str, Any]:
+        return {
+            "total_evaluations": total,
+            "completed": self.count,
+            "errors": self.errors,
+            "partial": self.partial,
+            "average_score": round(self.mean, 4) if self.count else None,
+            "std_score": round(math.sqrt(self._m2 / self.count), 4) if self.count else None,
+            "min_score": self.min,
+            "max_score": self.max
+        }
+
+# Batch ids name checkpoint files, so they may not contain path separators
+_BATCH_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def validate_batch_id(batch_id: str) -> str:
+    """Return the batch id, raising ValueError if it is not a safe file name"""
+    if not _BATCH_ID_RE.match(batch_id or ""):
+        raise ValueError(f"Invalid batch_id '{batch_id}': use 1-64 letters, digits, '-' or '_'")
+    return batch_id
+
+def requests_hash(requests: List[Dict[str, Any]]) -> str:
+    """Hash of a batch's request list"""
+    payload = json.dumps(requests, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def make_batch_id(requests: List[Dict[str, Any]]) -> str:
+    """Content-derived batch id, so re-posting the same set resumes it"""
+    return requests_hash(requests)[:16]
+
+class BatchEvaluationEngine:
+    """Runs evaluation batches with bounded concurrency and a JSONL checkpoint per batch"""
+
+    def __init__(self, checkpoint_dir: str = "eval_batches", concurrency: int = 2):
+        self.checkpoint_dir = checkpoint_dir
+        self.concurrency = concurrency
+        self.active: Dict[str, Dict[str, int]] = {}
+        # Checkpoint appends run on the db pool; one at a time keeps lines whole
+        self._write_lock = threading.Lock()
+
+    def _checkpoint_path(self, batch_id: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{validate_batch_id(batch_id)}.jsonl")
+
+    def _meta_path(self, batch_id: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{validate_batch_id(batch_id)}.json")
+
+    def check_resumable(self, batch_id: str, requests: List[Dict[str, Any]]):
+        """Raise ValueError if the batch id was checkpointed for a different request list
+
+        Checkpointed results are matched to requests by index, so resuming with
+        other requests would replay results that belong to different questions.
+        """
+        if not os.path.exists(self._meta_path(batch_id)):
+            return
+        with open(self._meta_path(batch_id), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("requests_hash") != requests_hash(requests):
+            raise ValueError(
+                f"Batch {batch_id} was checkpointed with different requests; use a new batch_id"
+            )
+
+    def load_checkpoint(self, batch_id: str) -> Dict[int, Dict[str, Any]]:
+        """Completed results of a batch, keyed by request index"""
+        path = self._checkpoint_path(batch_id)
+        completed: Dict[int, Dict[str, Any]] = {}
+        if not os.path.exists(path):
+            return completed
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write; that request is re-run
+                    continue
+                completed[record["request_id"]] = record
+        return completed
+
+    def summarize(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Statistics for a checkpointed batch, or None if it was never run"""
+        if not os.path.exists(self._checkpoint_path(batch_id)):
+            return None
+        stats = RunningStats()
+        for record in self.load_checkpoint(batch_id).values():
+            stats.add(record["evaluation"])
+        total = stats.count
+        if os.path.exists(self._meta_path(batch_id)):
+            with open(self._meta_path(batch_id), encoding="utf-8") as f:
+                total = json.load(f)["total"]
+        summary = stats.to_dict(total)
+        summary["running"] = batch_id in self.active
+        return summary
+
+    def _prepare(self, batch_id: str, requests: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Check the batch can resume, record its metadata and return its completed results"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.check_resumable(batch_id, requests)
+        completed = self.load_checkpoint(batch_id)
+        with open(self._meta_path(batch_id), "w", encoding="utf-8") as f:
+            json.dump({
+                "total": len(requests),
+                "requests_hash": requests_hash(requests),
+                "started_at": datetime.now().isoformat()
+            }, f)
+        return completed
+
+    def _append(self, checkpoint, record: Dict[str, Any]):
+        with self._write_lock:
+            checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+
+    async def run(self, batch_id: str, requests: List[Dict[str, Any]],
+                  evaluate: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                  concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Evaluate a batch and yield events as results complete
+
+        Results already in the checkpoint are replayed first and skipped. New results
+        are appended to the checkpoint as soon as they finish, so an interrupted run
+        (including a dropped client connection) resumes where it stopped. Failed
+        requests are not checkpointed and are retried on the next run.
+        """
+        if batch_id in self.active:
+            raise RuntimeError(f"Batch {batch_id} is already running")
+        self.active[batch_id] = {"total": len(requests)}
+        concurrency = max(1, concurrency or self.concurrency)
+        stats = RunningStats()
+        workers: List[asyncio.Task] = []
+        work: asyncio.Queue = asyncio.Queue()
+        events: asyncio.Queue = asyncio.Queue()
+        checkpoint = None
+
+        async def worker():
+            while True:
+                try:
+                    index = work.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                request = requests[index]
+                try:
+                    evaluation = await evaluate(request)
+                except Exception as e:
+                    logger.error(f"Batch {batch_id} request {index} failed: {e}")
+                    await events.put({
+                        "type": "error",
+                        "request_id": index,
+                        "question": request.get("question"),
+                        "message": str(e)
+                    })
+                    continue
+                record = {
+                    "request_id": index,
+                    "question": request.get("question"),
+                    "evaluation": evaluation,
+                    "completed_at": datetime.now().isoformat()
+                }
+                await run_blocking("db", self._append, checkpoint, record)
+                await events.put({"type": "result", "resumed": False, **record})
+
+        try:
+            completed = await run_blocking("db", self._prepare, batch_id, requests)
+            pending = [i for i in range(len(requests)) if i not in completed]
+            for index in pending:
+                work.put_nowait(index)
+            checkpoint = await run_blocking(
+                "db", open, self._checkpoint_path(batch_id), "a", encoding="utf-8"
+            )
+            yield {
+                "type": "start",
+                "batch_id": batch_id,
+                "total": len(requests),
+                "resumed": len(completed),
+                "pending": len(pending),
+                "concurrency": concurrency
+            }
+            for index in sorted(completed):
+                stats.add(completed[index]["evaluation"])
+                yield {"type": "result", "resumed": True, **completed[index]}
+
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(pending)))]
+            for _ in range(len(pending)):
+                event = await events.get()
+                if event["type"] == "result":
+                    stats.add(event["evaluation"])
+                else:
+                    stats.add_error()
+                done = stats.count + stats.errors
+                if done % 10 == 0 or done == len(requests):
+                    logger.info(f"Batch {batch_id}: {done}/{len(requests)} evaluated")
+                yield event
+            yield {
+                "type": "done",
+                "success": stats.errors == 0,
+                "batch_id": batch_id,
+                "batch_statistics": stats.to_dict(len(requests))
+            }
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if checkpoint is not None:
+                # A cancelled worker's append may still be running on the pool
+                with self._write_lock:
+                    checkpoint.close()
+            self.active.pop(batch_id, None)
+
+# Global batch engine
+batch_engine = BatchEvaluationEngine(
+    checkpoint_dir=os.getenv("RAG_EVAL_BATCH_DIR", "eval_batches"),
+    concurrency=int(os.getenv("RAG_EVAL_BATCH_CONCURRENCY", str(POOL_SIZES["eval"])))
+)
@@ -0,0 +1,335 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List
+import aiohttp
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main points.",
+    "What are the key requirements?",
+    "Which error codes are mentioned?",
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def summarize_latencies(latencies: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    """Compute p50/p99 latency in milliseconds per request kind"""
+    summary = {}
+    all_latencies = [value for values in latencies.values() for value in values]
+    for kind, values in list(latencies.items()) + [("all", all_latencies)]:
+        summary[kind] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+        }
+    return summary
+
+async def _load_worker(session: aiohttp.ClientSession, base_url: str, deadline: float,
+                       latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    """Issue mixed requests until the deadline"""
+    while time.perf_counter() < deadline:
+        kind = random.choices(
+            ["query", "agents_status", "evaluator_health"],
+            weights=[0.5, 0.3, 0.2]
+        )[0]
+        started = time.perf_counter()
+        try:
+            if kind == "query":
+                request = session.post(
+                    f"{base_url}/query",
+                    json={"question": random.choice(DEFAULT_QUESTIONS), "n_results": 5}
+                )
+            elif kind == "agents_status":
+                request = session.get(f"{base_url}/agents/status")
+            else:
+                request = session.get(f"{base_url}/evaluator/health")
+            async with request as response:
+                await response.read()
+                if response.status >= 400:
+                    errors[kind] = errors.get(kind, 0) + 1
+                    continue
+        except aiohttp.ClientError:
+            errors[kind] = errors.get(kind, 0) + 1
+            continue
+        latencies.setdefault(kind, []).append(time.perf_counter() - started)
+
+async def run_load_benchmark(base_url: str, concurrency: int = 32, duration: float = 60.0) -> Dict:
+    """Run concurrent mixed requests against a running backend"""
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(*[
+            _load_worker(session, base_url, deadline, latencies, errors)
+            for _ in range(concurrency)
+        ])
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": duration,
+        "latency": summarize_latencies(latencies),
+        "errors": errors,
+    }
+
+def generate_pdf_fixture(pages: int, paragraphs_per_page: int = 12) -> bytes:
+    """Generate a multi-page text PDF for extraction benchmarks"""
+    import pymupdf
+    
+    paragraph = (
+        "Section {page}.{index}: The maintenance procedure for unit ERR-{page:04d} requires "
+        "inspecting the pressure valve, recording the reading and resetting the controller. "
+    )
+    doc = pymupdf.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = "\n".join(
+            paragraph.format(page=page_number, index=index) * 2
+            for index in range(paragraphs_per_page)
+        )
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=7)
+    return doc.tobytes()
+
+def run_pdf_benchmark(pages: int = 500, workers: int = 0, repeats: int = 3) -> Dict:
+    """Compare single-process and process-pool text extraction on a generated PDF"""
+    import pymupdf
+    from pdf_extract import iter_pages_parallel, iter_pages_sequential, get_executor, shutdown_executor
+    
+    workers = workers or os.cpu_count() or 1
+    pdf = generate_pdf_fixture(pages)
+    buffer = memoryview(pdf)
+    
+    def sequential():
+        doc = pymupdf.open(stream=buffer, filetype="pdf")
+        try:
+            return list(iter_pages_sequential(doc))
+        finally:
+            doc.close()
+    
+    def parallel():
+        return list(iter_pages_parallel(buffer, pages, workers=workers))
+    
+    def best_of(func):
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+    
+    # Pool start-up is paid once per server, so measure it separately
+    started = time.perf_counter()
+    get_executor(workers)
+    list(iter_pages_parallel(buffer, min(pages, workers), workers=workers, pages_per_shard=1))
+    pool_startup = time.perf_counter() - started
+    
+    sequential_seconds, sequential_pages = best_of(sequential)
+    parallel_seconds, parallel_pages = best_of(parallel)
+    shutdown_executor()
+    
+    return {
+        "pages": pages,
+        "pdf_bytes": len(pdf),
+        "workers": workers,
+        "pool_startup_seconds": round(pool_startup, 3),
+        "sequential_seconds": round(sequential_seconds, 3),
+        "parallel_seconds": round(parallel_seconds, 3),
+        "speedup": round(sequential_seconds / parallel_seconds, 2) if parallel_seconds else None,
+        "identical_output": sequential_pages == parallel_pages,
+    }
+
+JUDGE_SAMPLES = [
+    {
+        "question": "What is the capital of France?",
+        "answer": "The capital of France is Paris. It is located in the north-central part of the country.",
+        "context": [
+            "Paris is the capital and most populous city of France.",
+            "Located in northern France, Paris is known for its culture and history.",
+            "The city has been the capital since the 12th century."
+        ],
+        "ground_truth": "Paris is the capital of France."
+    },
+    {
+        "question": "When was the Eiffel Tower completed?",
+        "answer": "The Eiffel Tower was completed in 1920 for the Olympic Games.",
+        "context": [
+            "The Eiffel Tower was constructed from 1887 to 1889 as the centerpiece of the 1889 World's Fair.",
+            "It is 330 metres tall and was the tallest man-made structure for 41 years."
+        ],
+        "ground_truth": "It was completed in 1889."
+    },
+    {
+        "question": "How do I reset the controller?",
+        "answer": "Hold the reset button for five seconds until the status light blinks.",
+        "context": [
+            "Pressure valves must be inspected every six months.",
+            "Readings are recorded in the maintenance log."
+        ],
+        "ground_truth": None
+    },
+]
+
+def _grade_agreement(per_metric: Dict, combined: Dict) -> Dict[str, bool]:
+    """Whether both modes reached the same verdict on each metric"""
+    agreement = {}
+    for metric in ("relevance", "groundedness", "retrieval_relevance", "correctness"):
+        if metric not in per_metric or metric not in combined:
+            continue
+        a, b = per_metric[metric], combined[metric]
+        if "score" in a:
+            agreement[metric] = abs(a["score"] - b["score"]) <= 1
+        elif "grounded" in a:
+            agreement[metric] = a["grounded"] == b["grounded"]
+        else:
+            agreement[metric] = a["correct"] == b["correct"]
+    return agreement
+
+def run_judge_benchmark(samples: List[Dict], model: str = "llama3") -> Dict:
+    """Compare per-metric and combined judge modes on tokens, wall time and agreement"""
+    from evaluator import RAGEvaluator
+    
+    evaluator = RAGEvaluator(model_name=model)
+    modes = {}
+    outputs: Dict[str, List[Dict]] = {}
+    for mode in ("per_metric", "combined"):
+        usage_before = evaluator.get_usage()
+        started = time.perf_counter()
+        outputs[mode] = [
+            evaluator.evaluate_complete_rag(mode=mode, **sample) for sample in samples
+        ]
+        elapsed = time.perf_counter() - started
+        usage_after = evaluator.get_usage()
+        modes[mode] = {
+            "wall_seconds": round(elapsed, 2),
+            **{key: usage_after[key] - usage_before[key] for key in usage_after},
+        }
+    
+    agreements = [
+        _grade_agreement(a, b) for a, b in zip(outputs["per_metric"], outputs["combined"])
+    ]
+    per_metric_agreement = {}
+    for agreement in agreements:
+        for metric, agreed in agreement.items():
+            per_metric_agreement.setdefault(metric, []).append(agreed)
+    score_deltas = [
+        abs(a["overall_score"] - b["overall_score"])
+        for a, b in zip(outputs["per_metric"], outputs["combined"])
+    ]
+    return {
+        "samples": len(samples),
+        "modes": modes,
+        "agreement": {
+            metric: round(sum(values) / len(values), 3)
+            for metric, values in per_metric_agreement.items()
+        },
+        "mean_overall_score_delta": round(sum(score_deltas) / len(score_deltas), 3) if score_deltas else None,
+    }
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+async def run_soak_benchmark(messages: int = 1_000_000, samples: int = 10) -> Dict:
+    """Push status updates through the agent buses and sample memory as they accumulate"""
+    from loguru import logger
+    from agent_communication import Message, MessageBus, MessageType, coordinator, simple_bus
+    
+    # Per-message INFO logging would dominate the run
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    
+    message_bus = MessageBus()
+    message_bus.register_agent("worker")
+    
+    checkpoints = []
+    interval = max(1, messages // samples)
+    started = time.perf_counter()
+    for i in range(1, messages + 1):
+        await simple_bus.send_message("document_agent", "system", "status_update", {
+            "agent": "document_agent",
+            "activity": "chunk_indexed",
+            "sequence": i
+        })
+        await message_bus.send_message(Message(
+            type=MessageType.STATUS_UPDATE, sender="soak", recipient="worker", content={"sequence": i}
+        ))
+        message_bus.message_queues["worker"].get_nowait()
+        if i % 100 == 0:
+            # Let the bus workers drain their queues, as a live event loop would
+            await asyncio.sleep(0)
+        if i % interval == 0:
+            checkpoints.append({
+                "messages": i,
+                "rss_mb": round(_rss_mb(), 1),
+                "activity_log": len(coordinator.activity_log),
+                "system_inbox": len(simple_bus.agents["system"]["messages"]),
+                "message_history": len(message_bus.message_history),
+                "system_queue_depth": simple_bus.get_queue_stats()["system"]["depth"]
+            })
+    elapsed = time.perf_counter() - started
+    await simple_bus.stop()
+    
+    first, last = checkpoints[0], checkpoints[-1]
+    return {
+        "messages": messages,
+        "seconds": round(elapsed, 2),
+        "messages_per_second": round(messages / elapsed),
+        "rss_growth_mb": round(last["rss_mb"] - first["rss_mb"], 1),
+        "checkpoints": checkpoints,
+        "system_queue": simple_bus.get_queue_stats()["system"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the RAG backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = subparsers.add_parser("load", help="p50/p99 latency under concurrent mixed requests")
+    load_parser.add_argument("--url", default="http://localhost:8000")
+    load_parser.add_argument("--concurrency", type=int, default=32)
+    load_parser.add_argument("--duration", type=float, default=60.0)
+
+    pdf_parser = subparsers.add_parser("pdf", help="single-process vs process-pool PDF extraction")
+    pdf_parser.add_argument("--pages", type=int, default=500)
+    pdf_parser.add_argument("--workers", type=int, default=0, help="0 uses all cores")
+    pdf_parser.add_argument("--repeats", type=int, default=3)
+
+    judge_parser = subparsers.add_parser("judge", help="per-metric vs combined evaluator judge mode")
+    judge_parser.add_argument("--dataset", help="JSON list of {question, answer, context, ground_truth}")
+    judge_parser.add_argument("--model", default="llama3")
+
+    soak_parser = subparsers.add_parser("soak", help="memory of agent buses under sustained status updates")
+    soak_parser.add_argument("--messages", type=int, default=1_000_000)
+    soak_parser.add_argument("--samples", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "load":
+        result = asyncio.run(run_load_benchmark(args.url, args.concurrency, args.duration))
+    elif args.command == "pdf":
+        result = run_pdf_benchmark(args.pages, args.workers, args.repeats)
+    elif args.command == "soak":
+        result = asyncio.run(run_soak_benchmark(args.messages, args.samples))
+    else:
+        samples = JUDGE_SAMPLES
+        if args.dataset:
+            with open(args.dataset) as f:
+                samples = json.load(f)
+        result = run_judge_benchmark(samples, args.model)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
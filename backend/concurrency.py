@@ -0,0 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+from loguru import logger
+
+# Worker counts per pool, overridable through the environment
+POOL_SIZES = {
+    "embed": int(os.getenv("RAG_EMBED_WORKERS", "4")),
+    "llm": int(os.getenv("RAG_LLM_WORKERS", "4")),
+    "eval": int(os.getenv("RAG_EVAL_WORKERS", "2")),
+    "db": int(os.getenv("RAG_DB_WORKERS", "4")),
+    "parse": int(os.getenv("RAG_PARSE_WORKERS", "2")),
+}
+
+class WorkerPools:
+    """Bounded thread pools that keep blocking model and database calls off the event loop"""
+
+    def __init__(self, sizes: Dict[str, int]):
+        self.sizes = dict(sizes)
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._in_flight: Dict[str, int] = {name: 0 for name in sizes}
+        self._completed: Dict[str, int] = {name: 0 for name in sizes}
+
+    def _executor(self, pool: str) -> ThreadPoolExecutor:
+        """Create pools lazily so importing this module stays cheap"""
+        if pool not in self.sizes:
+            raise KeyError(f"Unknown worker pool: {pool}")
+        if pool not in self._executors:
+            self._executors[pool] = ThreadPoolExecutor(
+                max_workers=max(1, self.sizes[pool]),
+                thread_name_prefix=f"rag-{pool}"
+            )
+        return self._executors[pool]
+
+    async def run(self, pool: str, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the named pool and await its result"""
+        loop = asyncio.get_running_loop()
+        executor = self._executor(pool)
+        self._in_flight[pool] += 1
+        try:
+            return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+        finally:
+            self._in_flight[pool] -= 1
+            self._completed[pool] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Get worker counts and load per pool"""
+        return {
+            name: {
+                "workers": size,
+                "in_flight": self._in_flight[name],
+                "completed": self._completed[name]
+            }
+            for name, size in self.sizes.items()
+        }
+
+    def shutdown(self):
+        """Shut down all pools"""
+        for name, executor in self._executors.items():
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"Shut down worker pool: {name}")
+        self._executors.clear()
+
+# Global worker pools
+worker_pools = WorkerPools(POOL_SIZES)
+
+async def run_blocking(pool: str, func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on one of the global worker pools"""
+    return await worker_pools.run(pool, func, *args, **kwargs)
@@ -0,0 +1,141 @@
+import math
+import os
+import re
+from typing import Dict, Any, List, Optional
+from lexical_index import tokenize
+
+# Approximate prompt tokens allowed for retrieved context
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "3000"))
+# Shortest shared text that counts as chunk overlap when merging neighbours
+MIN_MERGE_OVERLAP = int(os.getenv("RAG_CONTEXT_MIN_OVERLAP", "50"))
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+def estimate_tokens(text: str) -> int:
+    """Rough llama-family token count (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+def _overlap(first: str, second: str, min_overlap: int) -> int:
+    """Length of the longest suffix of first that is a prefix of second"""
+    if len(second) < min_overlap:
+        return 0
+    probe = second[:min_overlap]
+    position = first.find(probe, max(0, len(first) - len(second)))
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+def _merge_pair(first: str, second: str, min_overlap: int) -> Optional[str]:
+    """Join two chunks that overlap or contain each other, in either order"""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    overlap = _overlap(first, second, min_overlap)
+    if overlap:
+        return first + second[overlap:]
+    overlap = _overlap(second, first, min_overlap)
+    if overlap:
+        return second + first[overlap:]
+    return None
+
+def merge_overlapping(documents: List[str], sources: List[Optional[str]],
+                      min_overlap: int = MIN_MERGE_OVERLAP) -> List[str]:
+    """Merge chunks from the same source whose text overlaps, keeping rank order
+
+    A merged passage takes the position of its best ranked chunk. Chunks with no
+    known source are kept as they are, since overlap alone does not show they
+    come from the same document.
+    """
+    passages: List[List[Any]] = []
+    for document, source in zip(documents, sources):
+        text, target = document, None
+        merged = source is not None
+        # A new chunk can bridge two passages, so keep merging until nothing joins
+        while merged:
+            merged = False
+            for index, (passage_source, passage_text) in enumerate(passages):
+                if index == target or passage_source != source:
+                    continue
+                joined = _merge_pair(passage_text, text, min_overlap)
+                if joined is None:
+                    continue
+                if target is not None:
+                    del passages[max(index, target)]
+                    target = min(index, target)
+                else:
+                    target = index
+                passages[target][1] = text = joined
+                merged = True
+                break
+        if target is None:
+            passages.append([source, text])
+    return [text for _, text in passages]
+
+def extract_sentences(text: str, query_terms: set, token_budget: int) -> str:
+    """Keep the sentences sharing the most terms with the query, in original order
+
+    The best sentence is always kept, cut to the budget if it alone exceeds it.
+    """
+    sentences = [sentence.strip() for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(query_terms.intersection(tokenize(sentences[i]))), i)
+    )
+    picked, used = [], 0
+    for index in ranked:
+        # Counted with the separator it will be joined by
+        tokens = estimate_tokens(sentences[index] + " ... ")
+        if picked and used + tokens > token_budget:
+            continue
+        picked.append(index)
+        used += tokens
+    extract = " ... ".join(sentences[index] for index in sorted(picked))
+    return extract[:token_budget * 4] if estimate_tokens(extract) > token_budget else extract
+
+def build_context(question: str, documents: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                  token_budget: int = CONTEXT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """Assemble ranked chunks into prompt context within a token budget
+
+    Overlapping neighbour chunks of the same source are merged first; without
+    metadata nothing is merged. If the
+    passages still exceed the budget, each one in rank order gets the remaining
+    budget divided by the passages left; a passage larger than its share is cut
+    down to its most query-relevant sentences. Unused share carries over to the
+    following passages.
+    """
+    sources = [(metadata or {}).get("source") for metadata in metadatas] if metadatas else [None] * len(documents)
+    passages = merge_overlapping(documents, sources)
+    input_tokens = sum(estimate_tokens(document) for document in documents)
+    stats = {
+        "chunks": len(documents),
+        "merged": len(documents) - len(passages),
+        "compressed": 0,
+        "dropped": 0,
+        "input_tokens": input_tokens,
+        "token_budget": token_budget
+    }
+
+    if sum(estimate_tokens(passage) for passage in passages) > token_budget:
+        query_terms = set(tokenize(question))
+        # One token per passage covers the blank line that joins it to the next
+        remaining = token_budget - len(passages)
+        fitted = []
+        for position, passage in enumerate(passages):
+            share = remaining // (len(passages) - position)
+            if share <= 0:
+                stats["dropped"] += 1
+                continue
+            if estimate_tokens(passage) > share:
+                passage = extract_sentences(passage, query_terms, share)
+                stats["compressed"] += 1
+            remaining = max(0, remaining - estimate_tokens(passage))
+            fitted.append(passage)
+        passages = fitted
+
+    context = "\n\n".join(passages)
+    stats["passages"] = len(passages)
+    stats["context_tokens"] = estimate_tokens(context)
+    return {"context": context, "passages": passages, "stats": stats}
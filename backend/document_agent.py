@@ -1,10 +1,84 @@
-import tempfile
+import io
+import mmap
 import os
-from typing import Dict, Any
-from langchain_community.document_loaders import PyMuPDFLoader
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Tuple, Callable, Optional, Union, BinaryIO
+import pymupdf
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from loguru import logger
 from agent_communication import SimpleAgent
+from concurrency import run_blocking
+from ingest import SourceParseError
+from pdf_extract import (
+    PDF_WORKERS, PDF_PARALLEL_MIN_PAGES, iter_pages_parallel, iter_pages_sequential
+)
+
+def create_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Text splitter shared by PDF and URL ingest"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=2000,
+        chunk_overlap=400,
+        separators=["\n\n", "\n", ".", "?", "!", " ", ""],
+        length_function=len,
+        is_separator_regex=False
+    )
+
+PDFSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+@contextmanager
+def pdf_buffer(source: PDFSource) -> Iterator[memoryview]:
+    """Zero-copy view of a PDF held in memory or in an (upload) file object
+
+    In-memory spooled uploads expose their BytesIO buffer directly; uploads that
+    rolled over to disk are memory-mapped instead of being read into one bytes object.
+    The view (and map) is released on exit, so the upload can be closed or resized.
+    """
+    mapped = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+    else:
+        # SpooledTemporaryFile keeps the real file object in _file
+        raw = getattr(source, "_file", source)
+        if isinstance(raw, io.BytesIO):
+            view = raw.getbuffer()
+        else:
+            mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        view.release()
+        if mapped is not None:
+            mapped.close()
+
+def iter_pdf_pages(source: PDFSource, workers: Optional[int] = None,
+                   min_parallel_pages: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Lazily yield (text, metadata) for each page of a PDF parsed from memory
+
+    Documents with at least min_parallel_pages pages are extracted on a process pool
+    of the given number of workers; smaller ones stay on the current core.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    min_parallel_pages = PDF_PARALLEL_MIN_PAGES if min_parallel_pages is None else min_parallel_pages
+    
+    with pdf_buffer(source) as buffer:
+        doc = pymupdf.open(stream=buffer, filetype="pdf")
+        try:
+            if workers <= 1 or doc.page_count < min_parallel_pages:
+                yield from iter_pages_sequential(doc)
+                return
+            page_count = doc.page_count
+        finally:
+            doc.close()
+    
+    # Workers reopen the file by path when there is one, otherwise share the buffer
+    path = getattr(source, "name", None)
+    if not (isinstance(path, str) and os.path.isfile(path)):
+        path = None
+    logger.info(f"Extracting {page_count} pages on {workers} processes")
+    with pdf_buffer(source) as buffer:
+        yield from iter_pages_parallel(buffer, page_count, path=path, workers=workers)
 
 class DocumentAgent(SimpleAgent):
     """Simple document processing agent"""
@@ -28,7 +102,7 @@ class DocumentAgent(SimpleAgent):
                 {"filename": data["filename"], "success": result["success"]}
             )
     
-    async def process_pdf(self, file_content: bytes, filename: str) -> Dict[Any, Any]:
+    async def process_pdf(self, file_content: PDFSource, filename: str) -> Dict[Any, Any]:
         """Process a PDF file and return its chunks"""
         self.set_status("processing")
         
@@ -39,15 +113,13 @@ class DocumentAgent(SimpleAgent):
             "filename": filename
         })
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(file_content)
-            temp_path = temp_file.name
-        
         try:
-            # Load PDF
-            loader = PyMuPDFLoader(temp_path)
-            docs = loader.load()
+            # Load PDF straight from memory
+            pages = await run_blocking("parse", lambda: list(iter_pdf_pages(file_content)))
+            docs = [
+                Document(page_content=text, metadata={**metadata, "source": filename})
+                for text, metadata in pages
+            ]
             
             if not docs:
                 result = {
@@ -60,13 +132,7 @@ class DocumentAgent(SimpleAgent):
             logger.info(f"Loaded {len(docs)} pages from PDF")
             
             # Split documents
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=2000,
-                chunk_overlap=400,
-                separators=["\n\n", "\n", ".", "?", "!", " ", ""],
-                length_function=len,
-                is_separator_regex=False
-            )
+            text_splitter = create_text_splitter()
             
             all_splits = []
             for doc in docs:
@@ -77,7 +143,7 @@ class DocumentAgent(SimpleAgent):
             result = {
                 "success": True,
                 "chunks": all_splits,
-                "metadata": {"source": filename}
+                "metadata": {"source": filename, "pages": len(docs)}
             }
             
             # Log completion
@@ -108,19 +174,77 @@ class DocumentAgent(SimpleAgent):
             })
             
             return result
+
+    async def ingest_pdf(self, file_content: PDFSource, filename: str, pipeline,
+                         prune_stale: bool = True,
+                         progress: Optional[Callable[..., None]] = None) -> Dict[Any, Any]:
+        """Stream a PDF through an ingest pipeline page by page
         
-        finally:
-            # Clean up
-            try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Could not delete temporary file: {e}")
+        Failed results carry error_type "parse" (unreadable or empty PDF) or
+        "backend" (embedding or storage failure).
+        """
+        self.set_status("processing")
+        
+        await self.send_message("system", "status_update", {
+            "agent": self.name,
+            "activity": "processing_pdf",
+            "filename": filename
+        })
+        
+        try:
+            stats = await pipeline.run(
+                filename,
+                iter_pdf_pages(file_content),
+                create_text_splitter().split_text,
+                prune_stale=prune_stale,
+                progress=progress,
+                metadata={"doc_type": "pdf"}
+            )
+            
+            if not stats["total_chunks"]:
+                self.set_status("idle")
+                return {
+                    "success": False,
+                    "error": "No content found in the PDF file",
+                    "error_type": "parse"
+                }
+            
+            await self.send_message("system", "status_update", {
+                "agent": self.name,
+                "activity": "pdf_completed",
+                "filename": filename,
+                "chunks": stats["total_chunks"]
+            })
+            
+            self.set_status("idle")
+            return {"success": True, "stats": stats}
+        
+        except Exception as e:
+            logger.error(f"Error ingesting PDF: {str(e)}")
+            self.set_status("idle")
+            
+            await self.send_message("system", "status_update", {
+                "agent": self.name,
+                "activity": "pdf_error",
+                "filename": filename,
+                "error": str(e)
+            })
+            
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": "parse" if isinstance(e, SourceParseError) else "backend"
+            }
 
 # Global instance
 document_agent = DocumentAgent()
 
 # Legacy function for compatibility
-async def process_pdf(file_content: bytes, filename: str) -> Dict[Any, Any]:
+async def process_pdf(file_content: PDFSource, filename: str) -> Dict[Any, Any]:
     """Process PDF using the document agent"""
-    return await document_agent.process_pdf(file_content, filename)
\ No newline at end of file
+    return await document_agent.process_pdf(file_content, filename)
+
+async def ingest_pdf(file_content: PDFSource, filename: str, pipeline, prune_stale: bool = True,
+                     progress: Optional[Callable[..., None]] = None) -> Dict[Any, Any]:
+    """Stream a PDF through an ingest pipeline using the document agent"""
+    return await document_agent.ingest_pdf(file_content, filename, pipeline, prune_stale, progress)
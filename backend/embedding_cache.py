@@ -0,0 +1,157 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List
+import numpy as np
+from loguru import logger
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_SQL_BATCH = 500
+
+class EmbeddingCache:
+    """Persistent content-addressed embedding store backed by SQLite"""
+
+    def __init__(self, path: str = "embedding_cache.sqlite3", max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        logger.info(f"Embedding cache opened at {path} with {self._size} entries")
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Content address of a chunk for a given embedding model"""
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the given keys, refreshing their recency"""
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [now, *batch]
+                    )
+            self._conn.commit()
+            self.counters["hits"] += len(found)
+            self.counters["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        """Store vectors as float32 blobs and evict least recently used entries over capacity"""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, model, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            # Overwrite existing keys, then insert the rest; the insert count keeps
+            # the size current without re-counting the table
+            self._conn.executemany(
+                "UPDATE embeddings SET model = ?, dim = ?, vector = ?, last_used = ? WHERE key = ?",
+                [(*row[1:], row[0]) for row in rows]
+            )
+            self._size += self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows
+            ).rowcount
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                evicted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+                self._size -= evicted
+                self.counters["evictions"] += evicted
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate, size and eviction counters"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "path": self.path
+        }
+
+class CachedEmbeddings:
+    """Embeddings wrapper that only sends cache misses to the underlying model"""
+
+    def __init__(self, embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, reusing cached vectors for previously seen chunk text"""
+        keys = [self.cache.make_key(self.model_name, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        vectors = self.cache.get_many(unique_keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.model_name, computed)
+            vectors.update(computed)
+
+        logger.debug(f"Embedded {len(texts)} chunks ({len(missing)} sent to {self.model_name})")
+        return [vectors[key] for key in keys]
+
+    def embed_transient(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts that are not ingested chunks (e.g. evaluation passages)
+        
+        Cached vectors are reused, but misses are not written back, so one-off
+        texts never evict the vectors of real chunks.
+        """
+        keys = [self.cache.make_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(text for key, text in zip(keys, texts) if key not in vectors))
+        computed = dict(zip(missing, self.embeddings.embed_documents(missing))) if missing else {}
+        return [vectors[key] if key in vectors else computed[text] for key, text in zip(keys, texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are not cached here; see answer_cache for query-level caching"""
+        return self.embeddings.embed_query(text)
+
+def create_embedding_cache() -> EmbeddingCache:
+    """Create the embedding cache from environment configuration"""
+    return EmbeddingCache(
+        path=os.getenv("RAG_EMBED_CACHE_PATH", "embedding_cache.sqlite3"),
+        max_entries=int(os.getenv("RAG_EMBED_CACHE_MAX_ENTRIES", "200000"))
+    )
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+from loguru import logger
+
+class EvaluationCache:
+    """Persistent store of judge results keyed by metric, model, prompt version and inputs"""
+
+    def __init__(self, path: str = "eval_cache.sqlite3", max_entries: int = 50_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS evaluations (
+                key TEXT PRIMARY KEY,
+                metric TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_last_used ON evaluations(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "bypassed": 0}
+        logger.info(f"Evaluation cache opened at {path} with {self._size} entries")
+
+    @staticmethod
+    def make_key(metric: str, model: str, prompt_version: str, inputs: Dict[str, Any]) -> str:
+        """Hash of everything that determines a judgment at temperature 0"""
+        payload = json.dumps(
+            {"metric": metric, "model": model, "prompt_version": prompt_version, "inputs": inputs},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, refreshing its recency"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM evaluations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self._conn.execute("UPDATE evaluations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.counters["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, metric: str, result: Dict[str, Any]):
+        """Store a result and evict least recently used entries over capacity"""
+        now = time.time()
+        row = (metric, json.dumps(result, ensure_ascii=False), now, now, key)
+        with self._lock:
+            # Update in place if the key exists, otherwise insert and grow the size by one
+            updated = self._conn.execute(
+                "UPDATE evaluations SET metric = ?, result = ?, created_at = ?, last_used = ? WHERE key = ?",
+                row
+            ).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT INTO evaluations (metric, result, created_at, last_used, key) VALUES (?, ?, ?, ?, ?)",
+                    row
+                )
+                self._size += 1
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                evicted = self._conn.execute(
+                    "DELETE FROM evaluations WHERE key IN "
+                    "(SELECT key FROM evaluations ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+                self._size -= evicted
+                self.counters["evictions"] += evicted
+            self._conn.commit()
+
+    def record_bypass(self):
+        """Count a lookup skipped because the caller asked for a fresh judgment"""
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def clear(self) -> int:
+        """Drop every cached result"""
+        with self._lock:
+            removed = self._size
+            self._conn.execute("DELETE FROM evaluations")
+            self._conn.commit()
+            self._size = 0
+        logger.info(f"Evaluation cache cleared ({removed} entries)")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit rate, size and eviction counters"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "path": self.path
+        }
+
+def create_evaluation_cache() -> EvaluationCache:
+    """Create the evaluation cache from environment configuration"""
+    return EvaluationCache(
+        path=os.getenv("RAG_EVAL_CACHE_PATH", "eval_cache.sqlite3"),
+        max_entries=int(os.getenv("RAG_EVAL_CACHE_MAX_ENTRIES", "50000"))
+    )
@@ -1,10 +1,32 @@
 from typing_extensions import Annotated, TypedDict
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from langchain_ollama import ChatOllama
 from pydantic import BaseModel, Field
+from eval_cache import EvaluationCache
+from context_builder import CONTEXT_TOKEN_BUDGET, build_context
+from rouge_score import rouge_scorer
+from sklearn.feature_extraction.text import CountVectorizer
+import numpy as np
+import functools
+import inspect
 import json
+import os
+import re
+import threading
+import time
 from loguru import logger
 
+# Metric fan-out settings for evaluate_complete_rag
+METRIC_WORKERS = int(os.getenv("RAG_EVAL_METRIC_WORKERS", "4"))
+METRIC_TIMEOUT = float(os.getenv("RAG_EVAL_METRIC_TIMEOUT", "120"))
+# "per_metric" sends one judge prompt per metric, "combined" scores all metrics in one prompt
+EVAL_MODE = os.getenv("RAG_EVAL_MODE", "per_metric")
+# Token budget for retrieved context in judge prompts, assembled like the query path's
+EVAL_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_EVAL_CONTEXT_TOKEN_BUDGET", str(CONTEXT_TOKEN_BUDGET)))
+# Bump whenever an instruction or prompt template changes so cached judgments are not reused
+PROMPT_VERSION = "2"
+
 # Initialize Ollama LLM for evaluation
 evaluator_llm = ChatOllama(model="llama3", temperature=0)
 
@@ -94,60 +116,405 @@ Scoring scale:
 
 Consider the quality and relevance of ALL retrieved documents in your evaluation."""
 
+COMBINED_INSTRUCTIONS = """You are evaluating a retrieval-augmented answer on several metrics at once. You will be given a QUESTION, the RETRIEVED DOCUMENTS, the GENERATED ANSWER and possibly a GROUND TRUTH ANSWER.
+
+Metrics:
+(1) relevance: Does the answer directly, helpfully and completely address the question? Score 1-5 (5 = perfectly relevant, 1 = fails to address the question).
+(2) groundedness: Is every claim in the answer supported by the retrieved documents? A hallucination is information not present in or contradicting the documents.
+(3) retrieval_relevance: Do the retrieved documents contain information that helps answer the question? Score 1-5 (5 = directly address the question topic, 1 = don't help).
+(4) correctness (only when a GROUND TRUTH ANSWER is given): Is the answer factually accurate relative to the ground truth without conflicting statements? Extra accurate information is OK.
+
+Judge each metric independently and explain your reasoning for each one."""
+
+def cached_metric(metric: str):
+    """Serve a judge method from the evaluation cache, keyed by its arguments
+    
+    The wrapped method gains a use_cache keyword; use_cache=False re-scores and
+    overwrites the cached judgment. Error fallbacks are never cached.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, use_cache: bool = True, **kwargs):
+            if self.cache is None:
+                return func(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            inputs = {name: value for name, value in bound.arguments.items() if name != "self"}
+            key = self.cache.make_key(metric, self.model_id, PROMPT_VERSION, inputs)
+            if use_cache:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+            else:
+                self.cache.record_bypass()
+            result = func(self, *args, **kwargs)
+            if result and "error" not in result:
+                self.cache.put(key, metric, result)
+            return result
+        return wrapper
+    return decorator
+
+_JSON_START_RE = re.compile(r"\{")
+_CODE_FENCE_RE = re.compile(r"```(?:json)?", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_PYTHON_LITERAL_RE = re.compile(r"\b(True|False|None)\b")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_EXPLANATION_RE = re.compile(r'"?explanation"?\s*[:=]\s*"?([^\n"]+)', re.IGNORECASE)
+_BOOL_FIELD_RE = re.compile(
+    r'"?(correct|relevant|grounded|hallucination)"?\s*[:=]\s*"?(true|false|yes|no)\b', re.IGNORECASE
+)
+_SCORE_RE = re.compile(r'"?score"?\s*[:=]?\s*"?([1-5])\b', re.IGNORECASE)
+_TRUE_WORDS = {"true", "yes"}
+_json_decoder = json.JSONDecoder()
+
+def _first_json_object(text: str) -> Optional[Dict]:
+    """Decode the first JSON object embedded in text, scanning from each opening brace"""
+    for match in _JSON_START_RE.finditer(text):
+        try:
+            data, _ = _json_decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+def extract_json(text: str) -> Tuple[Optional[Dict], str]:
+    """Find the JSON object in a judge reply
+    
+    Returns the object and how it was found: "direct" (the reply is JSON),
+    "extracted" (JSON wrapped in prose or code fences) or "repaired" (after fixing
+    trailing commas and Python literals).
+    """
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data, "direct"
+    except json.JSONDecodeError:
+        pass
+    
+    data = _first_json_object(text)
+    if data is not None:
+        return data, "extracted"
+    
+    repaired = _CODE_FENCE_RE.sub("", text)
+    repaired = _PYTHON_LITERAL_RE.sub(lambda match: _PYTHON_LITERALS[match.group(1)], repaired)
+    repaired = _TRAILING_COMMA_RE.sub(r"\1", repaired)
+    data = _first_json_object(repaired)
+    if data is not None:
+        return data, "repaired"
+    return None, "invalid"
+
+def _parse_band(value: str) -> Tuple[float, float]:
+    low, high = (float(part) for part in value.split(","))
+    return low, high
+
+# Fast tier thresholds as "low,high": below low is a clear failure, at or above high a clear pass
+FAST_OVERLAP_BAND = _parse_band(os.getenv("RAG_FAST_OVERLAP_BAND", "0.35,0.7"))
+FAST_SIMILARITY_BAND = _parse_band(os.getenv("RAG_FAST_SIMILARITY_BAND", "0.45,0.7"))
+FAST_ROUGE_BAND = _parse_band(os.getenv("RAG_FAST_ROUGE_BAND", "0.2,0.5"))
+# Which fast-tier verdicts go on to the LLM judge: never, borderline, borderline_or_fail, always
+ESCALATION_POLICY = os.getenv("RAG_EVAL_ESCALATION", "borderline")
+
+class FastMetricTier:
+    """Lexical and embedding-similarity metrics computed in one vectorized pass per batch"""
+    
+    def __init__(self, embeddings=None):
+        self.embeddings = embeddings
+        self._vectorizer = CountVectorizer(binary=True, stop_words="english")
+        self._rouge = rouge_scorer.RougeScorer(["rouge1", "rougeL"], use_stemmer=True)
+    
+    def _overlap(self, answers: List[str], contexts: List[str]) -> np.ndarray:
+        """Share of each answer's content words that also appear in its retrieved context"""
+        n = len(answers)
+        try:
+            counts = self._vectorizer.fit_transform(answers + contexts).tocsr()
+        except ValueError:
+            # Every text was empty or stop words only
+            return np.zeros(n)
+        answer_counts, context_counts = counts[:n], counts[n:]
+        
+        # Share of answer tokens that also appear in the retrieved context
+        answer_binary = (answer_counts > 0).astype(np.float32)
+        context_binary = (context_counts > 0).astype(np.float32)
+        answer_sizes = np.asarray(answer_binary.sum(axis=1)).ravel()
+        shared = np.asarray(answer_binary.multiply(context_binary).sum(axis=1)).ravel()
+        return np.divide(shared, answer_sizes, out=np.zeros(n), where=answer_sizes > 0)
+    
+    def _embed_passages(self, texts: List[str]) -> List[List[float]]:
+        # Passages are not ingested chunks, so they must not be written to the ingest cache
+        embed = getattr(self.embeddings, "embed_transient", self.embeddings.embed_documents)
+        return embed(texts)
+    
+    def _similarity(self, questions: List[str], contexts: List[List[str]],
+                    question_embeddings: List[Optional[List[float]]],
+                    context_embeddings: List[Optional[List[List[float]]]]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Max and mean cosine similarity between each question and its retrieved chunks
+        
+        Items that carry the retrieval vectors of their chunks are scored without any
+        embedding call; for the others the passages are embedded.
+        """
+        if self.embeddings is None and (
+            any(vector is None for vector in question_embeddings)
+            or any(vectors is None for vectors in context_embeddings)
+        ):
+            return None
+        missing = [i for i, vector in enumerate(question_embeddings) if vector is None]
+        if missing:
+            computed = [self.embeddings.embed_query(questions[i]) for i in missing]
+            question_embeddings = list(question_embeddings)
+            for i, vector in zip(missing, computed):
+                question_embeddings[i] = vector
+        
+        to_embed = [
+            chunk for chunk_list, vectors in zip(contexts, context_embeddings) if vectors is None
+            for chunk in chunk_list
+        ]
+        embedded = iter(self._embed_passages(to_embed) if to_embed else [])
+        rows = []
+        sizes = []
+        for chunk_list, vectors in zip(contexts, context_embeddings):
+            vectors = list(vectors) if vectors is not None else [next(embedded) for _ in chunk_list]
+            rows.extend(vectors)
+            sizes.append(len(vectors))
+        sizes = np.array(sizes)
+        if not rows:
+            return np.zeros(len(questions)), np.zeros(len(questions))
+        chunk_matrix = _normalize_rows(np.asarray(rows, dtype=np.float32))
+        question_matrix = _normalize_rows(np.asarray(question_embeddings, dtype=np.float32))
+        
+        owners = np.repeat(np.arange(len(questions)), sizes)
+        similarities = np.einsum("ij,ij->i", chunk_matrix, question_matrix[owners])
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        has_chunks = sizes > 0
+        max_similarity = np.zeros(len(questions))
+        mean_similarity = np.zeros(len(questions))
+        max_similarity[has_chunks] = np.maximum.reduceat(similarities, starts[has_chunks])
+        mean_similarity[has_chunks] = np.add.reduceat(similarities, starts[has_chunks]) / sizes[has_chunks]
+        return max_similarity, mean_similarity
+    
+    @staticmethod
+    def _verdict(overlap: float, similarity: Optional[float], rouge: Optional[float]) -> Tuple[str, List[str]]:
+        checks = [("answer_context_overlap", overlap, FAST_OVERLAP_BAND)]
+        if similarity is not None:
+            checks.append(("retrieval_similarity", similarity, FAST_SIMILARITY_BAND))
+        if rouge is not None:
+            checks.append(("rouge1_f", rouge, FAST_ROUGE_BAND))
+        failing = [f"low_{name}" for name, value, (low, _) in checks if value < low]
+        if failing:
+            return "fail", failing
+        borderline = [f"borderline_{name}" for name, value, (_, high) in checks if value < high]
+        return ("borderline", borderline) if borderline else ("pass", [])
+    
+    @staticmethod
+    def should_escalate(verdict: str, policy: str = ESCALATION_POLICY) -> bool:
+        """Whether a fast-tier verdict is sent on to the LLM judge under a policy"""
+        if policy == "always":
+            return True
+        if policy == "borderline_or_fail":
+            return verdict != "pass"
+        if policy == "borderline":
+            return verdict == "borderline"
+        return False
+    
+    def evaluate(self, items: List[Dict[str, Any]], policy: str = ESCALATION_POLICY) -> List[Dict[str, Any]]:
+        """Score a batch of {question, answer, context, ground_truth[, question_embedding, context_embeddings]} items"""
+        if not items:
+            return []
+        questions = [item["question"] for item in items]
+        answers = [item["answer"] for item in items]
+        contexts = [list(item.get("context") or []) for item in items]
+        ground_truths = [item.get("ground_truth") for item in items]
+        
+        overlap = self._overlap(answers, ["\n".join(chunks) for chunks in contexts])
+        similarity = self._similarity(
+            questions, contexts,
+            [item.get("question_embedding") for item in items],
+            [item.get("context_embeddings") for item in items]
+        )
+        
+        results = []
+        for i in range(len(items)):
+            max_similarity = float(similarity[0][i]) if similarity is not None else None
+            rouge = None
+            rouge_l = None
+            if ground_truths[i]:
+                scores = self._rouge.score(ground_truths[i], answers[i])
+                rouge = scores["rouge1"].fmeasure
+                rouge_l = scores["rougeL"].fmeasure
+            verdict, reasons = self._verdict(float(overlap[i]), max_similarity, rouge)
+            
+            # Proxy on the judge's 1-5 scale so fast-only results aggregate with judged ones
+            signals = [float(overlap[i])]
+            if max_similarity is not None:
+                low, high = FAST_SIMILARITY_BAND
+                signals.append(min(1.0, max(0.0, (max_similarity - low) / (high - low))))
+            if rouge is not None:
+                signals.append(rouge)
+            results.append({
+                "answer_context_overlap": round(float(overlap[i]), 4),
+                "rouge1_f": round(rouge, 4) if rouge is not None else None,
+                "rougeL_f": round(rouge_l, 4) if rouge_l is not None else None,
+                "question_context_similarity": {
+                    "max": round(max_similarity, 4),
+                    "mean": round(float(similarity[1][i]), 4)
+                } if similarity is not None else None,
+                "verdict": verdict,
+                "reasons": reasons,
+                "escalate": self.should_escalate(verdict, policy),
+                "overall_score": round(1 + 4 * sum(signals) / len(signals), 2)
+            })
+        return results
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
 class RAGEvaluator:
     """Comprehensive RAG evaluation system using Ollama"""
     
-    def __init__(self, model_name: str = "llama3", temperature: float = 0):
-        self.llm = ChatOllama(model=model_name, temperature=temperature)
+    def __init__(self, model_name: str = "llama3", temperature: float = 0,
+                 metric_workers: int = METRIC_WORKERS, metric_timeout: float = METRIC_TIMEOUT,
+                 cache: Optional[EvaluationCache] = None, embeddings=None,
+                 context_budget: int = EVAL_CONTEXT_TOKEN_BUDGET):
+        # JSON mode constrains decoding to a single JSON object; the client timeout
+        # bounds a stalled connection, _invoke bounds a slow generation
+        self.llm = ChatOllama(
+            model=model_name, temperature=temperature, format="json",
+            client_kwargs={"timeout": metric_timeout}
+        )
+        self.model_id = f"{model_name}@{temperature}"
+        self.cache = cache
+        self.fast_tier = FastMetricTier(embeddings)
+        self.tier_stats = {"fast_only": 0, "escalated": 0}
+        self.metric_timeout = metric_timeout
+        self.context_budget = context_budget
+        self.mode = EVAL_MODE
+        self._usage_lock = threading.Lock()
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.parse_stats = {
+            "direct": 0, "extracted": 0, "repaired": 0, "invalid": 0, "reprompted": 0, "fallback": 0
+        }
+        self._metric_pool = ThreadPoolExecutor(
+            max_workers=max(1, metric_workers), thread_name_prefix="eval-metric"
+        )
+        # Per-thread judge deadline, set when a metric task starts running
+        self._local = threading.local()
         logger.info(f"Initialized RAG Evaluator with model: {model_name}")
     
-    def _parse_structured_output(self, response: str, schema_class) -> Dict:
-        """Parse LLM response into structured format"""
-        try:
-            # Try to extract JSON from the response
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            if start_idx != -1 and end_idx != 0:
-                json_str = response[start_idx:end_idx]
-                data = json.loads(json_str)
-                return schema_class(**data).dict()
-        except Exception as e:
-            logger.warning(f"Failed to parse structured output: {e}")
+    def _invoke(self, prompt: str):
+        """Call the judge model and record token usage
         
-        # Fallback: manual parsing
-        return self._manual_parse(response, schema_class)
+        Inside a metric task the reply is streamed and abandoned once the task's
+        deadline passes, which closes the request so Ollama stops generating and
+        the pool thread is freed.
+        """
+        deadline = getattr(self._local, "deadline", None)
+        if deadline is None:
+            response = self.llm.invoke(prompt)
+        else:
+            response = None
+            for chunk in self.llm.stream(prompt):
+                response = chunk if response is None else response + chunk
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"timed out after {self.metric_timeout}s")
+            if response is None:
+                raise RuntimeError("Judge returned an empty response")
+        usage = getattr(response, "usage_metadata", None) or {}
+        metadata = getattr(response, "response_metadata", None) or {}
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += usage.get("input_tokens", metadata.get("prompt_eval_count", 0)) or 0
+            self.usage["completion_tokens"] += usage.get("output_tokens", metadata.get("eval_count", 0)) or 0
+        return response
+    
+    def get_usage(self) -> Dict[str, int]:
+        """Judge calls and tokens processed since startup"""
+        with self._usage_lock:
+            return dict(self.usage)
+    
+    @staticmethod
+    def _fallback(schema_class, reason: str) -> Dict:
+        """Lowest-score result for a metric that errored or timed out"""
+        result = {"explanation": f"Evaluation error: {reason}", "error": reason}
+        for name in ("correct", "relevant", "grounded"):
+            if name in schema_class.__fields__:
+                result[name] = False
+        if "hallucination" in schema_class.__fields__:
+            result["hallucination"] = True
+        if "score" in schema_class.__fields__:
+            result["score"] = 1
+        return result
+    
+    def _count_parse(self, outcome: str):
+        with self._usage_lock:
+            self.parse_stats[outcome] += 1
+    
+    def get_parse_stats(self) -> Dict[str, Any]:
+        """Parse outcome counters with repair, re-prompt and fallback rates"""
+        with self._usage_lock:
+            stats = dict(self.parse_stats)
+        judged = stats["direct"] + stats["extracted"] + stats["repaired"] + stats["invalid"]
+        stats["repair_rate"] = round((stats["extracted"] + stats["repaired"]) / judged, 4) if judged else 0.0
+        stats["reprompt_rate"] = round(stats["reprompted"] / judged, 4) if judged else 0.0
+        stats["fallback_rate"] = round(stats["fallback"] / judged, 4) if judged else 0.0
+        return stats
+    
+    def _parse_structured_output(self, response: str, schema_class) -> Optional[Dict]:
+        """Parse LLM response into the grade schema, or None if it cannot be used"""
+        data, outcome = extract_json(response)
+        if data is not None:
+            try:
+                result = schema_class(**data).dict()
+                self._count_parse(outcome)
+                return result
+            except Exception as e:
+                logger.warning(f"{schema_class.__name__} validation failed: {e}")
+        self._count_parse("invalid")
+        return None
+    
+    def _judge(self, prompt: str, schema_class) -> Dict:
+        """Ask the judge for a grade, re-prompting once before falling back to text parsing"""
+        reply = self._invoke(prompt).content
+        result = self._parse_structured_output(reply, schema_class)
+        if result is None:
+            self._count_parse("reprompted")
+            response = self._invoke(
+                f"{prompt}\nYour previous reply was not a valid JSON object with the fields "
+                f"{', '.join(schema_class.__fields__)}. Reply with only that JSON object."
+            )
+            result = self._parse_structured_output(response.content, schema_class)
+        if result is None:
+            self._count_parse("fallback")
+            result = self._manual_parse(reply, schema_class)
+        return result
     
     def _manual_parse(self, response: str, schema_class) -> Dict:
-        """Manual parsing fallback"""
+        """Manual parsing fallback for replies with no usable JSON"""
         result = {}
         
-        # Extract explanation
-        if "explanation" in response.lower():
-            explanation_start = response.lower().find("explanation")
-            explanation_part = response[explanation_start:].split('\n')[0]
-            result["explanation"] = explanation_part.split(':', 1)[1].strip() if ':' in explanation_part else response
-        else:
-            result["explanation"] = response
-        
-        # Extract boolean values
-        response_lower = response.lower()
-        if "correct" in schema_class.__fields__:
-            result["correct"] = "true" in response_lower and "false" not in response_lower
-        if "relevant" in schema_class.__fields__:
-            result["relevant"] = "true" in response_lower and "false" not in response_lower
-        if "grounded" in schema_class.__fields__:
-            result["grounded"] = "true" in response_lower and "false" not in response_lower
+        explanation = _EXPLANATION_RE.search(response)
+        result["explanation"] = explanation.group(1).strip() if explanation else response
+        
+        # Read "field: value" pairs; a field that is never stated gets the cautious default
+        stated = {
+            match.group(1).lower(): match.group(2).lower() in _TRUE_WORDS
+            for match in _BOOL_FIELD_RE.finditer(response)
+        }
+        for name in ("correct", "relevant", "grounded"):
+            if name in schema_class.__fields__:
+                result[name] = stated.get(name, False)
         if "hallucination" in schema_class.__fields__:
-            result["hallucination"] = "hallucination" in response_lower and "no hallucination" not in response_lower
+            result["hallucination"] = stated.get("hallucination", not stated.get("grounded", False))
         
-        # Extract score
         if "score" in schema_class.__fields__:
-            import re
-            score_match = re.search(r'score[:\s]*(\d)', response_lower)
+            score_match = _SCORE_RE.search(response)
             result["score"] = int(score_match.group(1)) if score_match else 3
         
         return result
     
+    @cached_metric("correctness")
     def evaluate_correctness(self, question: str, student_answer: str, ground_truth: str) -> Dict:
         """Evaluate answer correctness against ground truth"""
         prompt = f"""
@@ -165,14 +532,14 @@ Provide your evaluation in this JSON format:
 """
         
         try:
-            response = self.llm.invoke(prompt)
-            result = self._parse_structured_output(response.content, CorrectnessGrade)
+            result = self._judge(prompt, CorrectnessGrade)
             logger.info(f"Correctness evaluation completed: {result['correct']}")
             return result
         except Exception as e:
             logger.error(f"Error in correctness evaluation: {e}")
-            return {"explanation": f"Evaluation error: {e}", "correct": False}
+            return self._fallback(CorrectnessGrade, str(e))
     
+    @cached_metric("relevance")
     def evaluate_relevance(self, question: str, answer: str) -> Dict:
         """Evaluate how well the answer addresses the question"""
         prompt = f"""
@@ -190,14 +557,14 @@ Provide your evaluation in this JSON format:
 """
         
         try:
-            response = self.llm.invoke(prompt)
-            result = self._parse_structured_output(response.content, RelevanceGrade)
+            result = self._judge(prompt, RelevanceGrade)
             logger.info(f"Relevance evaluation completed: {result['score']}/5")
             return result
         except Exception as e:
             logger.error(f"Error in relevance evaluation: {e}")
-            return {"explanation": f"Evaluation error: {e}", "relevant": False, "score": 1}
+            return self._fallback(RelevanceGrade, str(e))
     
+    @cached_metric("groundedness")
     def evaluate_groundedness(self, answer: str, context: List[str]) -> Dict:
         """Evaluate if the answer is grounded in the retrieved context"""
         context_text = "\n\n".join([f"Document {i+1}: {doc}" for i, doc in enumerate(context)])
@@ -219,14 +586,14 @@ Provide your evaluation in this JSON format:
 """
         
         try:
-            response = self.llm.invoke(prompt)
-            result = self._parse_structured_output(response.content, GroundednessGrade)
+            result = self._judge(prompt, GroundednessGrade)
             logger.info(f"Groundedness evaluation completed: grounded={result['grounded']}, hallucination={result['hallucination']}")
             return result
         except Exception as e:
             logger.error(f"Error in groundedness evaluation: {e}")
-            return {"explanation": f"Evaluation error: {e}", "grounded": False, "hallucination": True}
+            return self._fallback(GroundednessGrade, str(e))
     
+    @cached_metric("retrieval_relevance")
     def evaluate_retrieval_relevance(self, question: str, retrieved_docs: List[str]) -> Dict:
         """Evaluate relevance of retrieved documents to the question"""
         docs_text = "\n\n".join([f"Document {i+1}: {doc}" for i, doc in enumerate(retrieved_docs)])
@@ -248,46 +615,248 @@ Provide your evaluation in this JSON format:
 """
         
         try:
-            response = self.llm.invoke(prompt)
-            result = self._parse_structured_output(response.content, RetrievalRelevanceGrade)
+            result = self._judge(prompt, RetrievalRelevanceGrade)
             logger.info(f"Retrieval relevance evaluation completed: {result['score']}/5")
             return result
         except Exception as e:
             logger.error(f"Error in retrieval relevance evaluation: {e}")
-            return {"explanation": f"Evaluation error: {e}", "relevant": False, "score": 1}
+            return self._fallback(RetrievalRelevanceGrade, str(e))
     
-    def evaluate_complete_rag(self, question: str, answer: str, context: List[str], 
-                             ground_truth: Optional[str] = None) -> Dict:
-        """Perform complete RAG evaluation with all metrics"""
-        results = {}
+    @cached_metric("combined")
+    def evaluate_combined(self, question: str, answer: str, context: List[str],
+                          ground_truth: Optional[str] = None) -> Dict[str, Dict]:
+        """Score every metric with a single judge prompt
+        
+        The retrieved context goes through the model once instead of once per metric.
+        Returns the metrics whose section parsed into its grade schema; missing or
+        invalid sections are left out so the caller can fall back to per-metric calls.
+        """
+        docs_text = "\n\n".join([f"Document {i+1}: {doc}" for i, doc in enumerate(context)])
+        sections = {
+            "relevance": (RelevanceGrade, '{"explanation": "...", "relevant": true/false, "score": 1-5}'),
+            "groundedness": (GroundednessGrade, '{"explanation": "...", "grounded": true/false, "hallucination": true/false}'),
+            "retrieval_relevance": (RetrievalRelevanceGrade, '{"explanation": "...", "relevant": true/false, "score": 1-5}'),
+        }
+        ground_truth_text = ""
+        if ground_truth:
+            sections["correctness"] = (CorrectnessGrade, '{"explanation": "...", "correct": true/false}')
+            ground_truth_text = f"GROUND TRUTH ANSWER: {ground_truth}\n"
+        format_text = ",\n".join(f'    "{name}": {example}' for name, (_, example) in sections.items())
+        
+        prompt = f"""
+{COMBINED_INSTRUCTIONS}
+
+QUESTION: {question}
+
+RETRIEVED DOCUMENTS:
+{docs_text}
+
+GENERATED ANSWER: {answer}
+{ground_truth_text}
+Provide your evaluation in this JSON format:
+{{
+{format_text}
+}}
+"""
+        
+        response = self._invoke(prompt)
+        data, outcome = extract_json(response.content)
+        self._count_parse(outcome)
+        if data is None:
+            logger.warning("Combined evaluation returned no JSON")
+            return {}
         
-        # Always evaluate these three
-        results["relevance"] = self.evaluate_relevance(question, answer)
-        results["groundedness"] = self.evaluate_groundedness(answer, context)
-        results["retrieval_relevance"] = self.evaluate_retrieval_relevance(question, context)
+        results = {}
+        for name, (schema_class, _) in sections.items():
+            try:
+                results[name] = schema_class(**data[name]).dict()
+            except Exception as e:
+                logger.warning(f"Combined evaluation section {name} invalid: {type(e).__name__}")
+        logger.info(f"Combined evaluation completed: {len(results)}/{len(sections)} metrics parsed")
+        return results
+    
+    def _timed(self, func: Callable[..., Dict], *args, **kwargs) -> Dict:
+        """Run one metric task with a deadline that starts when the task does, not when it was queued"""
+        started = time.perf_counter()
+        self._local.deadline = started + self.metric_timeout
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            self._local.deadline = None
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+    
+    @staticmethod
+    def _metric_score(metric: str, result: Dict) -> float:
+        """Map a metric result onto the 1-5 scale used for the overall score"""
+        if metric == "correctness":
+            return 5 if result["correct"] else 1
+        if metric == "groundedness":
+            return 5 if result["grounded"] else 1
+        return result["score"]
+    
+    def evaluate_complete_rag(self, question: str, answer: str, context: List[str], 
+                             ground_truth: Optional[str] = None, mode: Optional[str] = None,
+                             use_cache: bool = True) -> Dict:
+        """Perform complete RAG evaluation with all metrics
         
+        The judge calls are independent, so they run concurrently on the metric pool.
+        A metric that errors or runs longer than metric_timeout (counted from when its
+        task starts, so time queued behind other evaluations does not count) is
+        reported with its fallback grade and left out of the overall score.
+        In "combined" mode one prompt scores every metric, and only metrics it failed
+        to produce are re-judged individually. Judgments come from the evaluation
+        cache when one is configured, unless use_cache is False. The context goes
+        through the same builder as query prompts, so judge prompts stay within
+        context_budget tokens; context already built for a query passes unchanged, and
+        contexts are never merged with each other since their sources are unknown.
+        """
+        mode = mode or self.mode
+        context = build_context(question, context, token_budget=self.context_budget)["passages"]
+        metrics = {
+            "relevance": (self.evaluate_relevance, (question, answer), RelevanceGrade),
+            "groundedness": (self.evaluate_groundedness, (answer, context), GroundednessGrade),
+            "retrieval_relevance": (self.evaluate_retrieval_relevance, (question, context), RetrievalRelevanceGrade),
+        }
         # Only evaluate correctness if ground truth is provided
         if ground_truth:
-            results["correctness"] = self.evaluate_correctness(question, answer, ground_truth)
+            metrics["correctness"] = (self.evaluate_correctness, (question, answer, ground_truth), CorrectnessGrade)
         
-        # Calculate overall score
-        scores = []
-        if ground_truth and "correctness" in results:
-            scores.append(5 if results["correctness"]["correct"] else 1)
-        scores.append(results["relevance"]["score"])
-        scores.append(5 if results["groundedness"]["grounded"] else 1)
-        scores.append(results["retrieval_relevance"]["score"])
+        started = time.perf_counter()
+        results = {}
+        latency_ms = {}
+        failed = []
+        
+        if mode == "combined":
+            future = self._metric_pool.submit(self._timed, self.evaluate_combined,
+                                              question, answer, context, ground_truth,
+                                              use_cache=use_cache)
+            try:
+                combined = future.result()
+            except Exception as e:
+                logger.error(f"Error in combined evaluation: {e}")
+                combined = {}
+            latency_ms["combined"] = combined.pop(
+                "latency_ms", round((time.perf_counter() - started) * 1000, 1)
+            )
+            for metric in list(metrics):
+                if metric in combined:
+                    results[metric] = combined[metric]
+                    metrics.pop(metric)
+            if metrics:
+                logger.info(f"Re-judging {', '.join(metrics)} individually")
+        
+        fan_out_started = time.perf_counter()
+        futures = {
+            metric: self._metric_pool.submit(self._timed, func, *args, use_cache=use_cache)
+            for metric, (func, args, _) in metrics.items()
+        }
+        for metric, future in futures.items():
+            schema_class = metrics[metric][2]
+            try:
+                # Each task enforces its own deadline, so this wait is bounded
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error in {metric} evaluation: {e}")
+                result = self._fallback(schema_class, str(e))
+                result["latency_ms"] = round((time.perf_counter() - fan_out_started) * 1000, 1)
+            latency_ms[metric] = result.pop("latency_ms")
+            if "error" in result:
+                failed.append(metric)
+            results[metric] = result
+        
+        evaluated = len(results)
+        # Calculate overall score from the metrics that completed
+        scores = [
+            self._metric_score(metric, result)
+            for metric, result in results.items() if metric not in failed
+        ]
+        if not scores:
+            scores = [self._metric_score(metric, result) for metric, result in results.items()]
         
         results["overall_score"] = sum(scores) / len(scores)
+        results["latency_ms"] = {
+            **latency_ms,
+            "total": round((time.perf_counter() - started) * 1000, 1)
+        }
         results["summary"] = {
-            "total_evaluations": len(scores),
+            "total_evaluations": evaluated,
+            "scored_evaluations": evaluated - len(failed),
+            "mode": mode,
+            "failed_metrics": failed,
+            "partial": bool(failed),
             "has_ground_truth": ground_truth is not None,
             "overall_score": results["overall_score"]
         }
         
-        logger.info(f"Complete RAG evaluation finished. Overall score: {results['overall_score']:.2f}/5")
+        logger.info(
+            f"Complete RAG evaluation finished in {results['latency_ms']['total']:.0f}ms. "
+            f"Overall score: {results['overall_score']:.2f}/5"
+            + (f" (failed: {', '.join(failed)})" if failed else "")
+        )
         return results
 
+    def evaluate_fast(self, items: List[Dict[str, Any]], policy: Optional[str] = None) -> Dict[str, Any]:
+        """Run only the non-LLM metric tier over a batch"""
+        started = time.perf_counter()
+        results = self.fast_tier.evaluate(items, policy or ESCALATION_POLICY)
+        return {
+            "results": results,
+            "escalations": sum(result["escalate"] for result in results),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    def evaluate_tiered(self, question: str, answer: str, context: List[str],
+                        ground_truth: Optional[str] = None, mode: Optional[str] = None,
+                        use_cache: bool = True, policy: Optional[str] = None,
+                        question_embedding: Optional[List[float]] = None,
+                        context_embeddings: Optional[List[List[float]]] = None) -> Dict:
+        """Score with the fast tier and escalate to the LLM judge only when the policy says so
+        
+        context_embeddings are the retrieval vectors of the chunks behind the context,
+        if the caller has them; the similarity check then needs no embedding calls.
+        Returns the complete_rag result (with the fast tier attached) when escalated,
+        otherwise the fast-tier result with its proxy overall score.
+        """
+        started = time.perf_counter()
+        fast = self.fast_tier.evaluate([{
+            "question": question,
+            "answer": answer,
+            "context": context,
+            "ground_truth": ground_truth,
+            "question_embedding": question_embedding,
+            "context_embeddings": context_embeddings
+        }], policy or ESCALATION_POLICY)[0]
+        fast_ms = round((time.perf_counter() - started) * 1000, 2)
+        
+        with self._usage_lock:
+            self.tier_stats["escalated" if fast["escalate"] else "fast_only"] += 1
+        if not fast["escalate"]:
+            return {
+                "tier": "fast",
+                "fast": fast,
+                "overall_score": fast["overall_score"],
+                "latency_ms": {"fast": fast_ms, "total": fast_ms},
+                "summary": {"escalated": False, "verdict": fast["verdict"], "overall_score": fast["overall_score"]}
+            }
+        
+        results = self.evaluate_complete_rag(question, answer, context, ground_truth, mode, use_cache)
+        results["tier"] = "judge"
+        results["fast"] = fast
+        results["latency_ms"]["fast"] = fast_ms
+        results["summary"]["escalated"] = True
+        results["summary"]["verdict"] = fast["verdict"]
+        return results
+    
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """How many tiered evaluations were settled by the fast tier vs escalated"""
+        with self._usage_lock:
+            stats = dict(self.tier_stats)
+        total = stats["fast_only"] + stats["escalated"]
+        stats["escalation_rate"] = round(stats["escalated"] / total, 4) if total else 0.0
+        stats["policy"] = ESCALATION_POLICY
+        return stats
+
 # Example usage and testing
 def test_evaluator():
     """Test the RAG evaluator with sample data"""
@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+from loguru import logger
+from concurrency import run_blocking
+
+# Used when the Chroma client cannot report its own limit
+DEFAULT_MAX_BATCH_SIZE = 5000
+
+# Pipeline micro-batch size and queue depth (in micro-batches) between stages
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "32"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("RAG_PIPELINE_QUEUE_SIZE", "4"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# One lock (and its number of holders and waiters) per (collection, source) being ingested
+_source_locks: Dict[Tuple[str, str], List[Any]] = {}
+
+def get_max_batch_size(client) -> int:
+    """Return the largest number of records the Chroma client accepts per write"""
+    try:
+        if hasattr(client, "get_max_batch_size"):
+            return int(client.get_max_batch_size())
+        return int(client.max_batch_size)
+    except Exception as e:
+        logger.warning(f"Could not read Chroma max batch size, using {DEFAULT_MAX_BATCH_SIZE}: {e}")
+        return DEFAULT_MAX_BATCH_SIZE
+
+def add_in_batches(collection, ids: List[str], documents: List[str], embeddings: List[List[float]],
+                   metadatas: Optional[List[Dict[str, Any]]] = None,
+                   batch_size: Optional[int] = DEFAULT_MAX_BATCH_SIZE,
+                   on_batch: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """Write chunks to a collection in bounded batches and report per-batch timings"""
+    if not (len(ids) == len(documents) == len(embeddings)):
+        raise ValueError("ids, documents and embeddings must have the same length")
+    if metadatas is not None and len(metadatas) != len(ids):
+        raise ValueError("metadatas must have the same length as ids")
+
+    batch_size = max(1, batch_size or DEFAULT_MAX_BATCH_SIZE)
+    batches = []
+    start_time = time.perf_counter()
+
+    for batch_start in range(0, len(ids), batch_size):
+        batch_end = batch_start + batch_size
+        batch_started = time.perf_counter()
+        collection.add(
+            ids=ids[batch_start:batch_end],
+            documents=documents[batch_start:batch_end],
+            embeddings=embeddings[batch_start:batch_end],
+            metadatas=metadatas[batch_start:batch_end] if metadatas is not None else None
+        )
+        elapsed = time.perf_counter() - batch_started
+        batches.append({
+            "batch": len(batches),
+            "size": len(ids[batch_start:batch_end]),
+            "seconds": round(elapsed, 4)
+        })
+        logger.debug(f"Indexed batch {len(batches)} ({batches[-1]['size']} chunks) in {elapsed:.3f}s")
+        if on_batch:
+            on_batch(min(batch_end, len(ids)))
+
+    total_seconds = time.perf_counter() - start_time
+    stats = {
+        "total_chunks": len(ids),
+        "batch_size": batch_size,
+        "batches": batches,
+        "total_seconds": round(total_seconds, 4),
+        "chunks_per_second": round(len(ids) / total_seconds, 2) if total_seconds > 0 else None
+    }
+    logger.info(f"Indexed {len(ids)} chunks in {len(batches)} batches ({total_seconds:.3f}s)")
+    return stats
+
+class SourceParseError(Exception):
+    """The source could not be read or split; the caller's input is at fault, not the backend"""
+
+def normalize_chunk_text(text: str) -> str:
+    """Collapse whitespace so chunks differing only in layout hash the same; case is kept"""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+def content_hash(text: str) -> str:
+    """Hash of the normalized chunk text"""
+    return hashlib.sha256(normalize_chunk_text(text).encode("utf-8")).hexdigest()[:32]
+
+def make_chunk_id(source: str, chunk_hash: str) -> str:
+    """Deterministic chunk id derived from the source and the chunk content"""
+    source_hash = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return f"{source_hash}-{chunk_hash}"
+
+@asynccontextmanager
+async def _source_lock(collection_name: str, source: str):
+    """Run ingests of the same source into the same collection one at a time
+
+    Each ingest reads the source's existing chunk ids first and prunes the ones it
+    did not write at the end, so two overlapping runs would delete each other's chunks.
+    """
+    key = (collection_name, source)
+    entry = _source_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _source_locks[key]
+
+class IngestPipeline:
+    """Streaming parse -> split -> embed -> index pipeline with bounded queues between stages
+
+    Pages are pulled lazily from an iterator, split into chunks, embedded in
+    micro-batches and written to the collection while later pages are still being
+    parsed. Bounded queues provide backpressure so memory stays proportional to the
+    queue sizes rather than the document. Chunks are upserted by content-derived id:
+    unchanged chunks cost no embedding calls, duplicates within a source are stored
+    once, and chunks that disappeared from the source are deleted. A lexical index,
+    if given, is updated alongside the collection.
+    """
+
+    def __init__(self, collection, embed_documents: Callable[[List[str]], List[List[float]]],
+                 embed_batch_size: int = EMBED_BATCH_SIZE, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 max_batch_size: Optional[int] = DEFAULT_MAX_BATCH_SIZE, lexical_index=None):
+        self.collection = collection
+        self.lexical_index = lexical_index
+        self.embed_documents = embed_documents
+        self.max_batch_size = max_batch_size
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.queue_size = max(1, queue_size)
+
+    async def run(self, source: str, pages: Iterator[Tuple[str, Dict[str, Any]]],
+                  split_text: Callable[[str], List[str]], prune_stale: bool = True,
+                  progress: Optional[Callable[..., None]] = None,
+                  metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Ingest one source; progress, if given, is called as progress(stage, **counters)
+
+        Errors reading or splitting the source are raised as SourceParseError;
+        embedding and storage errors propagate unchanged. Every new chunk is stored
+        with its page metadata, the source, its content hash, the ingest time and any
+        extra metadata given (e.g. doc_type). Runs for the same source into the same
+        collection wait for each other.
+        """
+        async with _source_lock(self.collection.name, source):
+            return await self._run(source, pages, split_text, prune_stale, progress, metadata)
+
+    async def _run(self, source: str, pages: Iterator[Tuple[str, Dict[str, Any]]],
+                   split_text: Callable[[str], List[str]], prune_stale: bool,
+                   progress: Optional[Callable[..., None]],
+                   metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        def report(stage: Optional[str] = None, **counters: int):
+            if progress:
+                progress(stage, **counters)
+
+        existing = await run_blocking("db", self.collection.get, where={"source": source}, include=[])
+        existing_ids = set(existing["ids"])
+        seen = set()
+        stats = {
+            "pages": 0,
+            "total_chunks": 0,
+            "duplicates_skipped": 0,
+            "unchanged": 0,
+            "added": 0,
+            "removed": 0,
+            "embed_seconds": 0.0,
+            "batches": [],
+        }
+        start_time = time.perf_counter()
+        source_metadata = {**(metadata or {}), "source": source, "ingested_at": time.time()}
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size * self.embed_batch_size)
+        index_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def parse_stage():
+            report("parsing")
+            while True:
+                try:
+                    page = await run_blocking("parse", next, pages, None)
+                    if page is None:
+                        break
+                    text, page_metadata = page
+                    chunks = await run_blocking("parse", split_text, text)
+                except Exception as e:
+                    raise SourceParseError(str(e)) from e
+                stats["pages"] += 1
+                for chunk in chunks:
+                    stats["total_chunks"] += 1
+                    chunk_hash = content_hash(chunk)
+                    chunk_id = make_chunk_id(source, chunk_hash)
+                    if chunk_id in seen:
+                        stats["duplicates_skipped"] += 1
+                        continue
+                    seen.add(chunk_id)
+                    if chunk_id in existing_ids:
+                        stats["unchanged"] += 1
+                        continue
+                    await chunk_queue.put((
+                        chunk_id, chunk,
+                        {**page_metadata, **source_metadata, "content_hash": chunk_hash}
+                    ))
+                report(parsed_pages=stats["pages"], chunks_total=len(seen))
+            await chunk_queue.put(None)
+
+        async def embed_stage():
+            batch = []
+            while True:
+                item = await chunk_queue.get()
+                if item is not None:
+                    batch.append(item)
+                if batch and (item is None or len(batch) >= self.embed_batch_size):
+                    embed_started = time.perf_counter()
+                    vectors = await run_blocking("embed", self.embed_documents, [text for _, text, _ in batch])
+                    stats["embed_seconds"] += time.perf_counter() - embed_started
+                    await index_queue.put((batch, vectors))
+                    stats["added"] += len(batch)
+                    report("embedding", chunks_embedded=stats["unchanged"] + stats["added"])
+                    batch = []
+                if item is None:
+                    break
+            await index_queue.put(None)
+
+        async def index_stage():
+            indexed = 0
+            while True:
+                item = await index_queue.get()
+                if item is None:
+                    break
+                batch, vectors = item
+                ids = [chunk_id for chunk_id, _, _ in batch]
+                texts = [text for _, text, _ in batch]
+                batch_stats = await run_blocking(
+                    "db", add_in_batches, self.collection, ids, texts, vectors,
+                    metadatas=[metadata for _, _, metadata in batch],
+                    batch_size=self.max_batch_size
+                )
+                if self.lexical_index is not None:
+                    await run_blocking("db", self.lexical_index.add, ids, texts)
+                for batch_info in batch_stats["batches"]:
+                    stats["batches"].append({**batch_info, "batch": len(stats["batches"])})
+                indexed += len(batch)
+                report("indexing", chunks_indexed=stats["unchanged"] + indexed)
+
+        tasks = [
+            asyncio.create_task(parse_stage()),
+            asyncio.create_task(embed_stage()),
+            asyncio.create_task(index_stage()),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        # A source that yielded no chunks never prunes: an empty parse is not an edit
+        stale_ids = [chunk_id for chunk_id in existing_ids if chunk_id not in seen] if prune_stale and seen else []
+        if stale_ids:
+            await run_blocking("db", self.collection.delete, ids=stale_ids)
+            if self.lexical_index is not None:
+                await run_blocking("db", self.lexical_index.remove, stale_ids)
+        stats["removed"] = len(stale_ids)
+
+        total_seconds = time.perf_counter() - start_time
+        stats["embed_seconds"] = round(stats["embed_seconds"], 4)
+        stats["total_seconds"] = round(total_seconds, 4)
+        stats["chunks_per_second"] = round(stats["total_chunks"] / total_seconds, 2) if total_seconds > 0 else None
+        report(
+            chunks_total=len(seen),
+            chunks_embedded=len(seen),
+            chunks_indexed=stats["unchanged"] + stats["added"]
+        )
+        logger.info(
+            f"Ingested {source}: {stats['pages']} pages, {stats['added']} added, "
+            f"{stats['unchanged']} unchanged, {stats['removed']} removed, "
+            f"{stats['duplicates_skipped']} duplicates skipped in {total_seconds:.3f}s"
+        )
+        return stats
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import uuid
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Any, List, Optional, Callable, Awaitable, BinaryIO, Tuple
+from loguru import logger
+from agent_communication import SimpleAgent
+from concurrency import run_blocking
+
+class JobStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+@dataclass
+class IngestJob:
+    kind: str  # "pdf" or "url"
+    source: str
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    status: JobStatus = JobStatus.PENDING
+    stage: str = "queued"
+    progress: Dict[str, int] = field(default_factory=lambda: {
+        "parsed_pages": 0,
+        "chunks_total": 0,
+        "chunks_embedded": 0,
+        "chunks_indexed": 0
+    })
+    options: Dict[str, Any] = field(default_factory=dict)
+    payload_path: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["status"] = self.status.value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IngestJob":
+        data = dict(data)
+        data["status"] = JobStatus(data["status"])
+        return cls(**data)
+
+class IngestJobManager(SimpleAgent):
+    """Background ingest jobs run on a bounded worker pool and persisted across restarts"""
+
+    def __init__(self, state_dir: str = "ingest_jobs", workers: int = 2,
+                 max_queue: int = 1000, max_finished: int = 1000):
+        super().__init__("ingest_jobs")
+        self.state_dir = state_dir
+        self.payload_dir = os.path.join(state_dir, "payloads")
+        self.state_path = os.path.join(state_dir, "jobs.json")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_finished = max_finished
+        self.jobs: Dict[str, IngestJob] = {}
+        self._runner: Optional[Callable[["IngestJob"], Awaitable[Dict[str, Any]]]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # State snapshots are written off the event loop; the sequence keeps a
+        # slower, older write from replacing a newer one
+        self._save_lock = threading.Lock()
+        self._save_seq = 0
+        self._saved_seq = 0
+
+    def set_runner(self, runner: Callable[["IngestJob"], Awaitable[Dict[str, Any]]]):
+        """Set the coroutine that performs the actual ingest for a job"""
+        self._runner = runner
+
+    async def start(self):
+        """Reload persisted jobs and start workers; unfinished jobs wait for resume()"""
+        await run_blocking("db", os.makedirs, self.payload_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        await run_blocking("db", self._load)
+
+        for job in self.jobs.values():
+            if job.status in (JobStatus.PENDING, JobStatus.RUNNING):
+                job.status = JobStatus.PENDING
+                job.stage = "queued"
+
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(max(1, self.workers))
+        ]
+        self.set_status("idle")
+
+    def resume(self):
+        """Requeue unfinished jobs from a previous run, once the runner can serve them
+
+        Jobs are fed in as queue space frees up, so any number of them can be
+        pending without overflowing the bounded queue.
+        """
+        pending = sorted(
+            (job for job in self.jobs.values() if job.status == JobStatus.PENDING),
+            key=lambda job: job.created_at
+        )
+        if pending:
+            logger.info(f"Resuming {len(pending)} unfinished ingest jobs")
+            self._tasks.append(asyncio.create_task(self._requeue([job.id for job in pending])))
+
+    async def _requeue(self, job_ids: List[str]):
+        for job_id in job_ids:
+            await self._queue.put(job_id)
+
+    async def stop(self):
+        """Stop workers; unfinished jobs stay persisted and resume on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._persist()
+
+    async def submit_pdfs(self, files: List[Tuple[str, BinaryIO]],
+                          options: Dict[str, Any] = None) -> List[IngestJob]:
+        """Persist uploaded PDFs and queue them for ingest; either all are queued or none"""
+        jobs = []
+        try:
+            for filename, source in files:
+                job = IngestJob(kind="pdf", source=filename, options=dict(options or {}))
+                job.payload_path = os.path.join(self.payload_dir, f"{job.id}.pdf")
+                jobs.append(job)
+                await run_blocking("parse", self._write_payload, job.payload_path, source)
+        except BaseException:
+            self._discard_payloads(jobs)
+            raise
+        return await self._enqueue(jobs)
+
+    @staticmethod
+    def _write_payload(path: str, source: BinaryIO):
+        """Stream an upload to disk in bounded chunks"""
+        source.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(source, f, length=1024 * 1024)
+
+    async def submit_urls(self, urls: List[str], options: Dict[str, Any] = None) -> List[IngestJob]:
+        """Queue URLs for ingest; either all are queued or none"""
+        return await self._enqueue([
+            IngestJob(kind="url", source=url, options=dict(options or {})) for url in urls
+        ])
+
+    async def _enqueue(self, jobs: List[IngestJob]) -> List[IngestJob]:
+        # No await between the capacity check and the puts, so the whole batch fits
+        if self._queue is None:
+            self._discard_payloads(jobs)
+            raise RuntimeError("Ingest job manager not started")
+        free = self.max_queue - self._queue.qsize()
+        if len(jobs) > free:
+            self._discard_payloads(jobs)
+            raise RuntimeError(f"Ingest job queue is full: room for {max(0, free)} of {len(jobs)} jobs")
+        for job in jobs:
+            self.jobs[job.id] = job
+            self._queue.put_nowait(job.id)
+            logger.info(f"Queued ingest job {job.id} ({job.kind}: {job.source})")
+        await self._persist()
+        return jobs
+
+    @staticmethod
+    def _discard_payloads(jobs: List[IngestJob]):
+        for job in jobs:
+            if job.payload_path and os.path.exists(job.payload_path):
+                os.unlink(job.payload_path)
+
+    def get_job(self, job_id: str) -> Optional[IngestJob]:
+        """Get a job by id"""
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, limit: int = 50, match: Optional[Callable[[IngestJob], bool]] = None) -> List[IngestJob]:
+        """Get the most recently created jobs, optionally only those passing `match`"""
+        jobs = [job for job in self.jobs.values() if match is None or match(job)]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)[:limit]
+
+    def update_progress(self, job: IngestJob, stage: Optional[str] = None, **counters: int):
+        """Record stage-level progress for a running job"""
+        if stage:
+            job.stage = stage
+        for key, value in counters.items():
+            job.progress[key] = value
+        job.updated_at = datetime.now().isoformat()
+
+    def get_stats(self, match: Optional[Callable[[IngestJob], bool]] = None) -> Dict[str, Any]:
+        """Get job counts per status (optionally only jobs passing `match`) and queue depth"""
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self.jobs.values():
+            if match is None or match(job):
+                counts[job.status.value] += 1
+        return {
+            "jobs": counts,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "workers": self.workers
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: IngestJob):
+        job.status = JobStatus.RUNNING
+        self.update_progress(job, stage="started")
+        await self._persist()
+        self.set_status("processing")
+        await self.send_message("system", "status_update", {
+            "agent": self.name,
+            "activity": "job_started",
+            "job_id": job.id,
+            "source": job.source
+        })
+
+        try:
+            if self._runner is None:
+                raise RuntimeError("No ingest runner configured")
+            job.result = await self._runner(job)
+            job.status = JobStatus.COMPLETED
+            self.update_progress(job, stage="completed")
+            activity = "job_completed"
+        except asyncio.CancelledError:
+            # Shutting down: leave the job pending so it is resumed on restart (stop() persists it)
+            job.status = JobStatus.PENDING
+            job.stage = "queued"
+            raise
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(getattr(e, "detail", e))
+            self.update_progress(job, stage="failed")
+            activity = "job_failed"
+            logger.error(f"Ingest job {job.id} failed: {job.error}")
+
+        if job.payload_path and os.path.exists(job.payload_path):
+            os.unlink(job.payload_path)
+        self._prune_finished()
+        await self._persist()
+        if self._queue.empty():
+            self.set_status("idle")
+        await self.send_message("system", "status_update", {
+            "agent": self.name,
+            "activity": activity,
+            "job_id": job.id,
+            "source": job.source,
+            "error": job.error
+        })
+
+    def _prune_finished(self):
+        finished = [
+            job for job in self.jobs.values()
+            if job.status in (JobStatus.COMPLETED, JobStatus.FAILED)
+        ]
+        if len(finished) > self.max_finished:
+            finished.sort(key=lambda job: job.updated_at)
+            for job in finished[:len(finished) - self.max_finished]:
+                del self.jobs[job.id]
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                self.jobs = {data["id"]: IngestJob.from_dict(data) for data in json.load(f)}
+            logger.info(f"Loaded {len(self.jobs)} ingest jobs from {self.state_path}")
+        except Exception as e:
+            logger.error(f"Could not load ingest jobs: {e}")
+
+    async def _persist(self):
+        """Snapshot job state on the event loop and write it from a worker thread"""
+        self._save_seq += 1
+        snapshot = [job.to_dict() for job in self.jobs.values()]
+        await run_blocking("db", self._save, self._save_seq, snapshot)
+
+    def _save(self, seq: int, snapshot: List[Dict[str, Any]]):
+        with self._save_lock:
+            if seq < self._saved_seq:
+                return
+            self._saved_seq = seq
+            os.makedirs(self.state_dir, exist_ok=True)
+            temp_path = f"{self.state_path}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.state_path)
+
+# Global job manager
+ingest_jobs = IngestJobManager(
+    state_dir=os.getenv("RAG_INGEST_JOB_DIR", "ingest_jobs"),
+    workers=int(os.getenv("RAG_INGEST_JOB_WORKERS", "2"))
+)
@@ -0,0 +1,187 @@
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from loguru import logger
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+_SQL_BATCH = 500
+
+# Identifiers such as ERR-0042, v2.1.3 or part_no stay whole; their parts are indexed too
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word and identifier tokens"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_RE.findall(token))
+    return tokens
+
+class BM25Index:
+    """Incrementally updated BM25 inverted index over collection chunk ids
+
+    Postings live in memory; each chunk's term frequencies are persisted to SQLite
+    as it is added, so a restart reloads the index without re-reading the
+    collection or re-tokenizing any text.
+    """
+
+    def __init__(self, path: str = "bm25_index.sqlite3", k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self.counters = {"searches": 0, "added": 0, "removed": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, terms TEXT NOT NULL)")
+        self._conn.commit()
+        for chunk_id, terms in self._conn.execute("SELECT id, terms FROM chunks"):
+            self._index(chunk_id, json.loads(terms))
+        logger.info(f"Lexical index opened at {path} with {len(self._lengths)} chunks")
+
+    def _index(self, chunk_id: str, terms: Dict[str, int]):
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[chunk_id] = tf
+        length = sum(terms.values())
+        self._lengths[chunk_id] = length
+        self._total_length += length
+
+    def _unindex(self, chunk_id: str, terms: Dict[str, int]):
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(chunk_id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id, 0)
+
+    def _stored_terms(self, ids: List[str]) -> Dict[str, Dict[str, int]]:
+        stored = {}
+        for start in range(0, len(ids), _SQL_BATCH):
+            batch = ids[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for chunk_id, terms in self._conn.execute(
+                f"SELECT id, terms FROM chunks WHERE id IN ({placeholders})", batch
+            ):
+                stored[chunk_id] = json.loads(terms)
+        return stored
+
+    def add(self, ids: List[str], documents: List[str]):
+        """Index chunks, replacing any previous entry under the same id"""
+        rows = [(chunk_id, dict(Counter(tokenize(text)))) for chunk_id, text in zip(ids, documents)]
+        with self._lock:
+            for chunk_id, terms in self._stored_terms([chunk_id for chunk_id, _ in rows]).items():
+                self._unindex(chunk_id, terms)
+            for chunk_id, terms in rows:
+                self._index(chunk_id, terms)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, terms) VALUES (?, ?)",
+                [(chunk_id, json.dumps(terms)) for chunk_id, terms in rows]
+            )
+            self._conn.commit()
+            self.counters["added"] += len(rows)
+
+    def remove(self, ids: List[str]):
+        """Drop chunks from the index"""
+        with self._lock:
+            stored = self._stored_terms(ids)
+            for chunk_id, terms in stored.items():
+                self._unindex(chunk_id, terms)
+            found = list(stored)
+            for start in range(0, len(found), _SQL_BATCH):
+                batch = found[start:start + _SQL_BATCH]
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            self._conn.commit()
+            self.counters["removed"] += len(found)
+
+    def clear(self):
+        """Drop every chunk"""
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._total_length = 0
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+        logger.info("Lexical index cleared")
+
+    def close(self):
+        """Drop the in-memory postings and close the SQLite connection"""
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._total_length = 0
+            self._conn.close()
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """Top chunk ids by BM25 score, best first"""
+        terms = set(tokenize(query))
+        with self._lock:
+            self.counters["searches"] += 1
+            count = len(self._lengths)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def rebuild(self, collection, batch_size: int = 1000) -> int:
+        """Re-index every chunk in a collection from scratch"""
+        self.clear()
+        offset = 0
+        while True:
+            batch = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            self.add(batch["ids"], batch["documents"])
+            offset += len(batch["ids"])
+        logger.info(f"Lexical index rebuilt with {offset} chunks")
+        return offset
+
+    def sync(self, collection) -> bool:
+        """Rebuild only if the index and collection disagree on chunk count"""
+        if collection.count() == len(self._lengths):
+            return False
+        self.rebuild(collection)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size and update counters"""
+        return {
+            **self.counters,
+            "chunks": len(self._lengths),
+            "terms": len(self._postings),
+            "average_chunk_tokens": round(self._total_length / len(self._lengths), 1) if self._lengths else 0.0,
+            "path": self.path
+        }
+
+def create_lexical_index(path: Optional[str] = None) -> BM25Index:
+    """Create a lexical index from environment configuration, at path if given"""
+    return BM25Index(
+        path=path or os.getenv("RAG_BM25_INDEX_PATH", "bm25_index.sqlite3"),
+        k1=float(os.getenv("RAG_BM25_K1", "1.5")),
+        b=float(os.getenv("RAG_BM25_B", "0.75"))
+    )
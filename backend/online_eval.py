@@ -0,0 +1,196 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from loguru import logger
+from agent_communication import SimpleAgent
+
+class QualityWindow:
+    """Aggregated evaluation results for one fixed time window"""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.count = 0
+        self.score_sum = 0.0
+        self.min_score: Optional[float] = None
+        self.max_score: Optional[float] = None
+        self.escalated = 0
+        self.failed = 0
+        self.verdicts: Dict[str, int] = {}
+        # Running sums of per-metric signals, averaged on read
+        self.metric_sums: Dict[str, float] = {}
+        self.metric_counts: Dict[str, int] = {}
+
+    def _add_metric(self, name: str, value: Optional[float]):
+        if value is None:
+            return
+        self.metric_sums[name] = self.metric_sums.get(name, 0.0) + value
+        self.metric_counts[name] = self.metric_counts.get(name, 0) + 1
+
+    def add(self, result: Dict[str, Any]):
+        score = result["overall_score"]
+        self.count += 1
+        self.score_sum += score
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+
+        summary = result.get("summary", {})
+        if summary.get("escalated"):
+            self.escalated += 1
+        if summary.get("partial"):
+            self.failed += 1
+        verdict = summary.get("verdict")
+        if verdict:
+            self.verdicts[verdict] = self.verdicts.get(verdict, 0) + 1
+
+        fast = result.get("fast")
+        if fast:
+            self._add_metric("answer_context_overlap", fast["answer_context_overlap"])
+            similarity = fast.get("question_context_similarity")
+            self._add_metric("retrieval_similarity", similarity["max"] if similarity else None)
+        if "relevance" in result:
+            self._add_metric("relevance_score", result["relevance"]["score"])
+        if "retrieval_relevance" in result:
+            self._add_metric("retrieval_relevance_score", result["retrieval_relevance"]["score"])
+        if "groundedness" in result:
+            self._add_metric("grounded_rate", 1.0 if result["groundedness"]["grounded"] else 0.0)
+
+    def to_dict(self, window_seconds: float) -> Dict[str, Any]:
+        return {
+            "window_start": datetime.fromtimestamp(self.start).isoformat(),
+            "window_end": datetime.fromtimestamp(self.start + window_seconds).isoformat(),
+            "evaluations": self.count,
+            "average_score": round(self.score_sum / self.count, 4) if self.count else None,
+            "min_score": self.min_score,
+            "max_score": self.max_score,
+            "escalated": self.escalated,
+            "partial": self.failed,
+            "verdicts": dict(self.verdicts),
+            "metrics": {
+                name: round(total / self.metric_counts[name], 4)
+                for name, total in self.metric_sums.items()
+            }
+        }
+
+class OnlineEvaluator(SimpleAgent):
+    """Scores a random sample of production answers in the background
+
+    Sampled queries go on a bounded queue and are evaluated by worker tasks, so the
+    request path never waits on the judge. A full queue drops the sample rather than
+    applying backpressure. Results are folded into fixed time windows.
+    """
+
+    def __init__(self, sample_rate: float = 0.1, workers: int = 1, max_queue: int = 100,
+                 window_seconds: float = 300, max_windows: int = 288):
+        super().__init__("online_evaluator")
+        self.sample_rate = sample_rate
+        self.workers = workers
+        self.max_queue = max_queue
+        self.window_seconds = window_seconds
+        self.windows: deque = deque(maxlen=max_windows)
+        self.counters = {"seen": 0, "sampled": 0, "dropped": 0, "evaluated": 0, "errors": 0}
+        self._runner: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def set_runner(self, runner: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
+        """Set the coroutine that evaluates one sample"""
+        self._runner = runner
+
+    async def start(self):
+        """Start evaluation workers"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))
+        ]
+        self.set_status("idle")
+        logger.info(f"Online evaluation sampling {self.sample_rate:.0%} of queries")
+
+    async def stop(self):
+        """Stop workers; queued samples are discarded"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def maybe_submit(self, question: str, answer: str, context: List[str],
+                     question_embedding: Optional[List[float]] = None,
+                     context_embeddings: Optional[List[List[float]]] = None) -> bool:
+        """Sample a served answer for background evaluation without blocking the caller"""
+        self.counters["seen"] += 1
+        if self._queue is None or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait({
+                "question": question,
+                "answer": answer,
+                "context": context,
+                "question_embedding": question_embedding,
+                "context_embeddings": context_embeddings,
+                "served_at": time.time()
+            })
+        except asyncio.QueueFull:
+            self.counters["dropped"] += 1
+            return False
+        self.counters["sampled"] += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            sample = await self._queue.get()
+            try:
+                if self._runner is None:
+                    raise RuntimeError("No online evaluation runner configured")
+                self.set_status("processing")
+                result = await self._runner(sample)
+                self._record(sample["served_at"], result)
+                self.counters["evaluated"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["errors"] += 1
+                logger.error(f"Online evaluation failed: {e}")
+            finally:
+                self._queue.task_done()
+                if self._queue.empty():
+                    self.set_status("idle")
+
+    def _window_for(self, timestamp: float) -> QualityWindow:
+        start = timestamp - timestamp % self.window_seconds
+        # Samples finish roughly in order, so the matching window is almost always the last
+        for window in reversed(self.windows):
+            if window.start == start:
+                return window
+            if window.start < start:
+                break
+        window = QualityWindow(start)
+        self.windows.append(window)
+        if len(self.windows) > 1 and self.windows[-2].start > start:
+            self.windows = deque(sorted(self.windows, key=lambda w: w.start), maxlen=self.windows.maxlen)
+        return window
+
+    def _record(self, served_at: float, result: Dict[str, Any]):
+        self._window_for(served_at).add(result)
+
+    def get_stats(self, limit: int = 12) -> Dict[str, Any]:
+        """Sampling counters and the most recent quality windows, newest first"""
+        recent = list(self.windows)[-limit:] if limit > 0 else []
+        return {
+            **self.counters,
+            "sample_rate": self.sample_rate,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "window_seconds": self.window_seconds,
+            "windows": [window.to_dict(self.window_seconds) for window in reversed(recent)]
+        }
+
+# Global online evaluator
+online_evaluator = OnlineEvaluator(
+    sample_rate=float(os.getenv("RAG_ONLINE_EVAL_SAMPLE_RATE", "0.1")),
+    workers=int(os.getenv("RAG_ONLINE_EVAL_WORKERS", "1")),
+    max_queue=int(os.getenv("RAG_ONLINE_EVAL_QUEUE", "100")),
+    window_seconds=float(os.getenv("RAG_ONLINE_EVAL_WINDOW", "300")),
+    max_windows=int(os.getenv("RAG_ONLINE_EVAL_WINDOWS", "288"))
+)
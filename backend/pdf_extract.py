@@ -0,0 +1,128 @@
+import atexit
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import pymupdf
+from loguru import logger
+
+# Parallel extraction settings; documents below the cutoff stay single-process
+PDF_WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("RAG_PDF_PARALLEL_MIN_PAGES", "200"))
+PDF_PAGES_PER_SHARD = int(os.getenv("RAG_PDF_PAGES_PER_SHARD", "25"))
+
+# Reference a worker can open: ("path", file path, 0) or ("shm", segment name, byte size)
+SourceRef = Tuple[str, str, int]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+
+# Worker-side cache of the most recently opened document
+_worker_source: Optional[SourceRef] = None
+_worker_doc = None
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_view: Optional[memoryview] = None
+
+def _close_in_worker():
+    """Release the cached document and shared memory mapping in a worker process"""
+    global _worker_source, _worker_doc, _worker_shm, _worker_view
+    if _worker_doc is not None:
+        _worker_doc.close()
+        _worker_doc = None
+    if _worker_shm is not None:
+        _worker_view.release()
+        _worker_shm.close()
+        _worker_shm = _worker_view = None
+    _worker_source = None
+
+# Workers unmap shared memory cleanly on exit; a no-op in the server process
+atexit.register(_close_in_worker)
+
+def _open_in_worker(source: SourceRef):
+    """Open (or reuse) the document for a source reference inside a worker process"""
+    global _worker_source, _worker_doc, _worker_shm, _worker_view
+    if source == _worker_source:
+        return _worker_doc
+    _close_in_worker()
+
+    kind, location, size = source
+    if kind == "path":
+        _worker_doc = pymupdf.open(location)
+    else:
+        _worker_shm = shared_memory.SharedMemory(name=location)
+        # The segment may be larger than requested, so trim it to the PDF size
+        _worker_view = _worker_shm.buf[:size]
+        _worker_doc = pymupdf.open(stream=_worker_view, filetype="pdf")
+    _worker_source = source
+    return _worker_doc
+
+def _extract_range(source: SourceRef, start: int, end: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """Extract text for pages [start, end) in a worker process"""
+    doc = _open_in_worker(source)
+    return [
+        (doc[number].get_text(), {"page": number, "total_pages": doc.page_count})
+        for number in range(start, end)
+    ]
+
+def get_executor(workers: int = PDF_WORKERS) -> ProcessPoolExecutor:
+    """Long-lived process pool, created on first use so startup is paid once"""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        # spawn avoids forking a process that is running threads
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        _executor_workers = workers
+        logger.info(f"Started PDF extraction pool with {workers} processes")
+    return _executor
+
+def shutdown_executor():
+    """Shut down the extraction process pool"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def iter_pages_sequential(doc) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (text, metadata) for each page of an open document on the current core"""
+    for page in doc:
+        yield page.get_text(), {"page": page.number, "total_pages": doc.page_count}
+
+def iter_pages_parallel(buffer: memoryview, page_count: int, path: Optional[str] = None,
+                        workers: int = PDF_WORKERS,
+                        pages_per_shard: int = PDF_PAGES_PER_SHARD) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Shard page ranges across the process pool and yield pages back in page order
+
+    Workers reopen the file by path when there is one; otherwise the buffer is copied
+    once into a shared memory segment that all workers map. Results are yielded as
+    soon as every earlier shard has finished, so downstream stages keep streaming.
+    """
+    pages_per_shard = max(1, pages_per_shard)
+    shards = [
+        (start, min(start + pages_per_shard, page_count))
+        for start in range(0, page_count, pages_per_shard)
+    ]
+
+    segment = None
+    if path:
+        source: SourceRef = ("path", os.path.abspath(path), 0)
+    else:
+        segment = shared_memory.SharedMemory(create=True, size=len(buffer))
+        segment.buf[:len(buffer)] = buffer
+        source = ("shm", segment.name, len(buffer))
+
+    executor = get_executor(workers)
+    futures = [executor.submit(_extract_range, source, start, end) for start, end in shards]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        if segment is not None:
+            segment.close()
+            segment.unlink()
@@ -1,47 +1,74 @@
 import tempfile
 import os
+import time
+from datetime import datetime
 from typing import List, Optional
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 from loguru import logger
 
-from document_agent import process_pdf
+from document_agent import PDFSource, create_text_splitter, ingest_pdf as stream_pdf
 from scrape_agent import scrape_url
 from agent_communication import simple_bus, coordinator
+from ingest import IngestPipeline, SourceParseError, get_max_batch_size
+from concurrency import run_blocking, worker_pools
+from pdf_extract import shutdown_executor as shutdown_pdf_executor
+from embedding_cache import CachedEmbeddings, create_embedding_cache
+from ingest_jobs import IngestJob, ingest_jobs
+from batch_eval import batch_engine, make_batch_id, validate_batch_id
+from eval_cache import create_evaluation_cache
+from online_eval import online_evaluator
+from tenants import DEFAULT_TENANT, TENANT_HEADER, TenantHandle, TenantRegistry, TenantPathMiddleware
+from retrieval import RETRIEVAL_MODE, build_where, make_citations, retrieve
+from context_builder import build_context
 
 # Langchain and database imports
 from langchain_ollama import OllamaEmbeddings, ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import chromadb
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from evaluator import RAGEvaluator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 from pydantic import BaseModel
 import json
 
 # Pydantic models
 class QueryRequest(BaseModel):
     question: str
-    n_results: Optional[int] = 5
+    n_results: int = Field(5, ge=1, le=100)
+    # Optional retrieval scope, pushed into the Chroma where clause
+    sources: Optional[List[str]] = None
+    doc_types: Optional[List[str]] = None  # "pdf" or "url"
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
     success: bool
     message: Optional[str] = None
+    cache: Optional[str] = None
+    retrieval: Optional[Dict[str, Any]] = None
+    citations: Optional[List[Dict[str, Any]]] = None
 
 class ProcessURL(BaseModel):
     url: str
+    prune_stale: Optional[bool] = True
+
+class ProcessURLBatch(BaseModel):
+    urls: List[str]
+    prune_stale: Optional[bool] = True
 
 class EvaluationRequest(BaseModel):
     question: str
     answer: str
     context: List[str]
     ground_truth: Optional[str] = None
+    mode: Optional[str] = None  # "per_metric" or "combined"; defaults to RAG_EVAL_MODE
 
 class CorrectnessEvaluationRequest(BaseModel):
     question: str
@@ -84,34 +111,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /t/{tenant}/... routes to the plain endpoints for the named tenant
+app.add_middleware(TenantPathMiddleware)
+
 # Global variables
 embeddings = None
 client = None
 collection = None
 embedding_dim = None
 llm = None
+max_batch_size = None
+embedding_cache = None
+evaluation_cache = None
+lexical_index = None
+tenants = None
 
 # Initialize components
 def initialize_components():
     """Initialize embeddings, Chroma client, LLM, and evaluator"""
-    global embeddings, client, collection, embedding_dim, llm, evaluator
+    global embeddings, client, collection, embedding_dim, llm, evaluator, max_batch_size, embedding_cache, evaluation_cache, lexical_index, tenants
     try:
-        embeddings = OllamaEmbeddings(model="mxbai-embed-large")
+        # Chunk embeddings go through a persistent cache so re-ingest skips the model
+        embedding_cache = create_embedding_cache()
+        embeddings = CachedEmbeddings(
+            OllamaEmbeddings(model="mxbai-embed-large"),
+            embedding_cache,
+            model_name="mxbai-embed-large"
+        )
         client = chromadb.PersistentClient(path="chroma_store")
+        max_batch_size = get_max_batch_size(client)
         
         # Test embedding dimensions
         test_single = embeddings.embed_query("test")
         embedding_dim = len(test_single)
         
-        # Create or get collection
-        collection_name = f"docs_mxbai_{embedding_dim}d"
-        collection = client.get_or_create_collection(name=collection_name)
+        # Tenant collections are opened on demand; the default tenant keeps the
+        # original collection and BM25 index, each only rebuilt if it fell out of step,
+        # and stays pinned for the life of the process
+        tenants = TenantRegistry(client, f"docs_mxbai_{embedding_dim}d", embedding_dim)
+        default = tenants.acquire(DEFAULT_TENANT)
+        collection = default.collection
+        lexical_index = default.lexical_index
         
         # Initialize LLM
         llm = ChatOllama(model="llama3", temperature=0.7)
         
-        # Initialize evaluator
-        evaluator = RAGEvaluator(model_name="llama3", temperature=0)
+        # Initialize evaluator; judgments are memoized across requests and restarts
+        evaluation_cache = create_evaluation_cache()
+        evaluator = RAGEvaluator(
+            model_name="llama3", temperature=0, cache=evaluation_cache, embeddings=embeddings
+        )
         
         logger.success("All components initialized successfully!")
         return True
@@ -126,52 +175,81 @@ async def startup_event():
     success = initialize_components()
     if not success:
         logger.error("Failed to initialize components")
-
-@app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload and process a PDF file"""
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    content = await file.read()
-    result = await process_pdf(content, file.filename)
+    # Resume persisted ingest jobs; without a working backend they would all fail, so they stay pending
+    ingest_jobs.set_runner(run_ingest_job)
+    await ingest_jobs.start()
+    if success:
+        ingest_jobs.resume()
+    else:
+        logger.warning("Unfinished ingest jobs stay pending until the backend starts with all components")
     
-    if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["error"])
-    
-    # Add chunks to vector database
-    chunks = result["chunks"]
-    texts = [chunk.page_content for chunk in chunks]
-    embeddings_list = embeddings.embed_documents(texts)
-    
-    # Store in database
-    for i, (text, emb) in enumerate(zip(texts, embeddings_list)):
-        doc_id = f"{file.filename}_{i}"
-        collection.add(
-            ids=[doc_id],
-            documents=[text],
-            embeddings=[emb]
-        )
+    # Background scoring of sampled production answers
+    online_evaluator.set_runner(run_online_evaluation)
+    await online_evaluator.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop ingest, online evaluation and message bus workers, close tenant handles and release worker and process pools on shutdown"""
+    await ingest_jobs.stop()
+    await online_evaluator.stop()
+    await simple_bus.stop()
+    if tenants is not None:
+        tenants.close()
+    worker_pools.shutdown()
+    shutdown_pdf_executor()
+
+async def acquire_tenant(name: Optional[str] = None) -> TenantHandle:
+    """Open (or reuse) and pin a tenant's handle; invalid names are a 400"""
+    if tenants is None:
+        raise HTTPException(status_code=503, detail="Backend components not initialized")
+    try:
+        return await run_blocking("db", tenants.acquire, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def current_tenant(x_tenant_id: Optional[str] = Header(None, alias=TENANT_HEADER)):
+    """Tenant named by the X-Tenant-ID header or a /t/{tenant}/ path prefix
     
-    return {"success": True, "message": f"Processed {len(chunks)} chunks"}
+    The handle stays pinned until the response (including a streamed one) is sent.
+    """
+    tenant = await acquire_tenant(x_tenant_id)
+    try:
+        yield tenant
+    finally:
+        tenants.release(tenant)
 
-@app.post("/url")
-async def process_webpage(url_data: ProcessURL):
-    """Process content from a URL"""
-    if not all([embeddings, collection]):
-        raise HTTPException(
-            status_code=503,
-            detail="Backend components not initialized"
-        )
+def create_pipeline(tenant: TenantHandle) -> IngestPipeline:
+    """Create an ingest pipeline over a tenant's collection"""
+    return IngestPipeline(
+        tenant.collection, embeddings.embed_documents,
+        max_batch_size=max_batch_size, lexical_index=tenant.lexical_index
+    )
+
+async def ingest_pdf(content: PDFSource, filename: str, tenant: TenantHandle, prune_stale: bool = True,
+                     progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """Stream a PDF through the parse -> split -> embed -> index pipeline"""
+    result = await stream_pdf(content, filename, create_pipeline(tenant), prune_stale, progress)
     
-    # Validate URL
-    if not url_data.url.startswith(('http://', 'https://')):
-        raise HTTPException(
-            status_code=400,
-            detail="Invalid URL. Must start with http:// or https://"
-        )
+    if not result["success"]:
+        # Bad input is the client's fault; an embedding or database failure is ours
+        status_code = 400 if result.get("error_type") == "parse" else 500
+        raise HTTPException(status_code=status_code, detail=result["error"])
+    
+    ingest_stats = result["stats"]
+    if ingest_stats["added"] or ingest_stats["removed"]:
+        tenant.answer_cache.invalidate(f"uploaded {filename}")
     
-    result = await scrape_url(url_data.url)
+    return {
+        "success": True,
+        "message": f"Processed {ingest_stats['total_chunks']} chunks",
+        "ingest_stats": ingest_stats
+    }
+
+async def ingest_url(url: str, tenant: TenantHandle, prune_stale: bool = True,
+                     progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """Scrape a URL and stream its content through the ingest pipeline"""
+    result = await scrape_url(url)
     
     if not result["success"]:
         raise HTTPException(
@@ -179,40 +257,33 @@ async def process_webpage(url_data: ProcessURL):
             detail=result.get("error", "Failed to process URL")
         )
     
-    # Process the content using text splitter
     content = result["content"]
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=400,
-        separators=["\n\n", "\n", ".", "?", "!", " ", ""],
-        length_function=len,
-        is_separator_regex=False
-    )
-    
-    text_chunks = text_splitter.split_text(content)
-    
-    if not text_chunks:
+    if not content.strip():
         raise HTTPException(
             status_code=400,
             detail="No content could be extracted from the URL"
         )
     
-    # Create embeddings and store
+    # Split, embed and store
     try:
-        embeddings_list = embeddings.embed_documents(text_chunks)
-        
-        for i, (text, emb) in enumerate(zip(text_chunks, embeddings_list)):
-            doc_id = f"url_{i}"
-            collection.add(
-                ids=[doc_id],
-                documents=[text],
-                embeddings=[emb]
-            )
+        ingest_stats = await create_pipeline(tenant).run(
+            url,
+            iter([(content, {})]),
+            create_text_splitter().split_text,
+            prune_stale=prune_stale,
+            progress=progress,
+            metadata={"doc_type": "url"}
+        )
+        if ingest_stats["added"] or ingest_stats["removed"]:
+            tenant.answer_cache.invalidate(f"ingested {url}")
         
         return {
             "success": True,
-            "message": f"Processed {len(text_chunks)} chunks from URL"
+            "message": f"Processed {ingest_stats['total_chunks']} chunks from URL",
+            "ingest_stats": ingest_stats
         }
+    except SourceParseError as e:
+        raise HTTPException(status_code=400, detail=f"Could not split URL content: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing URL content: {str(e)}")
         raise HTTPException(
@@ -220,21 +291,163 @@ async def process_webpage(url_data: ProcessURL):
             detail=f"Error processing URL content: {str(e)}"
         )
 
+def job_tenant(job: IngestJob) -> str:
+    """Tenant a job ingests into; jobs queued before tenants existed belong to the default one"""
+    return job.options.get("tenant", DEFAULT_TENANT)
+
+async def run_ingest_job(job: IngestJob) -> Dict[str, Any]:
+    """Run one background ingest job, reporting stage progress on the job"""
+    if not all([embeddings, collection]):
+        raise RuntimeError("Backend components not initialized")
+    
+    def progress(stage: Optional[str] = None, **counters: int):
+        ingest_jobs.update_progress(job, stage, **counters)
+    
+    prune_stale = job.options.get("prune_stale", True)
+    tenant = await run_blocking("db", tenants.acquire, job_tenant(job))
+    try:
+        if job.kind == "pdf":
+            with open(job.payload_path, "rb") as f:
+                return await ingest_pdf(f, job.source, tenant, prune_stale, progress)
+        
+        ingest_jobs.update_progress(job, stage="scraping")
+        return await ingest_url(job.source, tenant, prune_stale, progress)
+    finally:
+        tenants.release(tenant)
+
+def query_filter(request: QueryRequest) -> Optional[Dict[str, Any]]:
+    """Chroma where clause for the request's retrieval scope"""
+    return build_where(request.sources, request.doc_types, request.ingested_after, request.ingested_before)
+
+async def retrieve_context(tenant: TenantHandle, question: str, query_embedding: List[float], n_results: int,
+                           where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Retrieve and rerank a tenant's chunks, then assemble them into token-budgeted prompt context"""
+    results = await retrieve(
+        tenant.collection, tenant.lexical_index, question, query_embedding, n_results, where=where
+    )
+    built = build_context(question, results['documents'], results['metadatas'])
+    retrieval = results['retrieval']
+    retrieval['context'] = built['stats']
+    retrieval['tokens_saved'] = retrieval['baseline_tokens'] - built['stats']['context_tokens']
+    return {
+        **results,
+        "context": built['context'],
+        "passages": built['passages'],
+        "citations": make_citations(results['ids'], results['metadatas'])
+    }
+
+def _validate_url(url: str):
+    if not url.startswith(('http://', 'https://')):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid URL. Must start with http:// or https://"
+        )
+
+@app.post("/upload")
+async def upload_document(file: UploadFile = File(...), prune_stale: bool = True,
+                          tenant: TenantHandle = Depends(current_tenant)):
+    """Upload and process a PDF file"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    # Parse from the spooled upload file without materializing it as bytes
+    return await ingest_pdf(file.file, file.filename, tenant, prune_stale)
+
+@app.post("/url")
+async def process_webpage(url_data: ProcessURL, tenant: TenantHandle = Depends(current_tenant)):
+    """Process content from a URL"""
+    if not all([embeddings, collection]):
+        raise HTTPException(
+            status_code=503,
+            detail="Backend components not initialized"
+        )
+    
+    # Validate URL
+    _validate_url(url_data.url)
+    
+    return await ingest_url(url_data.url, tenant, url_data.prune_stale)
+
+@app.post("/jobs/upload")
+async def submit_upload_jobs(files: List[UploadFile] = File(...), prune_stale: bool = True,
+                             tenant: TenantHandle = Depends(current_tenant)):
+    """Queue one or more PDFs for background ingest"""
+    for file in files:
+        if not file.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail=f"Only PDF files are supported: {file.filename}")
+    
+    # The batch is queued whole or rejected whole, so no accepted job goes unreported
+    try:
+        jobs = await ingest_jobs.submit_pdfs(
+            [(file.filename, file.file) for file in files], {"prune_stale": prune_stale, "tenant": tenant.name}
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {"success": True, "jobs": [job.to_dict() for job in jobs]}
+
+@app.post("/jobs/url")
+async def submit_url_jobs(request: ProcessURLBatch, tenant: TenantHandle = Depends(current_tenant)):
+    """Queue one or more URLs for background ingest"""
+    for url in request.urls:
+        _validate_url(url)
+    
+    try:
+        jobs = await ingest_jobs.submit_urls(
+            request.urls, {"prune_stale": request.prune_stale, "tenant": tenant.name}
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return {"success": True, "jobs": [job.to_dict() for job in jobs]}
+
+@app.get("/jobs")
+async def list_ingest_jobs(limit: int = 50, tenant: TenantHandle = Depends(current_tenant)):
+    """List recent ingest jobs of the tenant"""
+    owned = lambda job: job_tenant(job) == tenant.name
+    return {
+        "jobs": [job.to_dict() for job in ingest_jobs.list_jobs(limit, owned)],
+        "stats": ingest_jobs.get_stats(owned)
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: str, tenant: TenantHandle = Depends(current_tenant)):
+    """Get the status and stage-level progress of one of the tenant's ingest jobs"""
+    job = ingest_jobs.get_job(job_id)
+    # Another tenant's job is reported as missing so its existence does not leak
+    if not job or job_tenant(job) != tenant.name:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
 @app.post("/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+async def query_documents(request: QueryRequest, tenant: TenantHandle = Depends(current_tenant)):
     """Query documents without evaluation"""
     if not all([embeddings, collection, llm]):
         raise HTTPException(status_code=503, detail="Components not initialized")
     
+    start_time = time.perf_counter()
+    answer_cache = tenant.answer_cache
+    # An ingest finishing while this query runs invalidates the cache; its answer is then not stored
+    generation = answer_cache.generation
     try:
         # Query the collection
-        query_embedding = embeddings.embed_query(request.question)
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=request.n_results
-        )
+        query_embedding = await run_blocking("embed", embeddings.embed_query, request.question)
+        where = query_filter(request)
+        
+        # Semantic tier: reuse an answer for a near-identical question; scoped
+        # queries skip it since a cached answer may come from other documents
+        cached = answer_cache.get_semantic(query_embedding, request.n_results) if where is None else None
+        if cached:
+            return QueryResponse(
+                answer=cached.answer,
+                sources=cached.sources,
+                success=True,
+                cache="semantic",
+                citations=cached.citations
+            )
         
-        if not results['documents'][0]:
+        results = await retrieve_context(tenant, request.question, query_embedding, request.n_results, where)
+        
+        if not results['documents']:
             return QueryResponse(
                 answer="No relevant documents found. Please upload some documents first.",
                 sources=[],
@@ -242,43 +455,202 @@ async def query_documents(request: QueryRequest):
                 message="No documents found"
             )
         
+        # Exact tier: same normalized question over the same retrieved chunks
+        cache_key = answer_cache.make_key(request.question, results['ids'], request.n_results)
+        cached = answer_cache.get(cache_key)
+        if cached:
+            return QueryResponse(
+                answer=cached.answer,
+                sources=cached.sources,
+                success=True,
+                cache="exact",
+                retrieval=results['retrieval'],
+                citations=cached.citations
+            )
+        
         # Generate response
-        context = "\n\n".join(results['documents'][0])
+        context = results['context']
         prompt = ChatPromptTemplate.from_template(
             "Answer based on this context:\n{context}\nQuestion: {question}"
         )
         chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({
+        response = await run_blocking("llm", chain.invoke, {
             "context": context,
             "question": request.question
         })
         
+        sources = results['documents'][:3]
+        answer_cache.put(
+            cache_key, response, sources, request.n_results,
+            query_embedding if where is None else None, results['citations'], generation
+        )
+        online_evaluator.maybe_submit(
+            request.question, response, results['passages'], query_embedding, results['embeddings']
+        )
+        
         return QueryResponse(
             answer=response,
-            sources=results['documents'][0][:3],
-            success=True
+            sources=sources,
+            success=True,
+            retrieval=results['retrieval'],
+            citations=results['citations']
         )
         
     except Exception as e:
         logger.error(f"Error in query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        tenant.record_query((time.perf_counter() - start_time) * 1000)
+
+def _ndjson(event: Dict[str, Any]) -> str:
+    """Serialize one streaming event as a newline-delimited JSON line"""
+    return json.dumps(event) + "\n"
+
+@app.post("/query/stream")
+async def query_documents_stream(request: QueryRequest, tenant: TenantHandle = Depends(current_tenant)):
+    """Query documents and stream the answer as NDJSON events"""
+    if not all([embeddings, collection, llm]):
+        raise HTTPException(status_code=503, detail="Components not initialized")
+    
+    answer_cache = tenant.answer_cache
+    
+    async def event_stream():
+        start_time = time.perf_counter()
+        generation = answer_cache.generation
+        try:
+            # Retrieve before the first byte so sources can be sent immediately
+            query_embedding = await run_blocking("embed", embeddings.embed_query, request.question)
+            where = query_filter(request)
+            cached = answer_cache.get_semantic(query_embedding, request.n_results) if where is None else None
+            cache_key = None
+            if cached is None:
+                results = await retrieve_context(
+                    tenant, request.question, query_embedding, request.n_results, where
+                )
+                documents = results['documents']
+                if documents:
+                    cache_key = answer_cache.make_key(
+                        request.question, results['ids'], request.n_results
+                    )
+                    cached = answer_cache.get(cache_key)
+            retrieval_ms = (time.perf_counter() - start_time) * 1000
+            
+            if cached:
+                yield _ndjson({
+                    "type": "sources",
+                    "sources": cached.sources,
+                    "citations": cached.citations,
+                    "retrieval_ms": round(retrieval_ms, 1)
+                })
+                yield _ndjson({"type": "token", "content": cached.answer})
+                yield _ndjson({
+                    "type": "done",
+                    "success": True,
+                    "cache": "exact" if cache_key else "semantic",
+                    "timings": {
+                        "retrieval_ms": round(retrieval_ms, 1),
+                        "total_ms": round((time.perf_counter() - start_time) * 1000, 1)
+                    }
+                })
+                return
+            
+            yield _ndjson({
+                "type": "sources",
+                "sources": documents[:3],
+                "citations": results['citations'],
+                "retrieval_ms": round(retrieval_ms, 1)
+            })
+            
+            if not documents:
+                yield _ndjson({
+                    "type": "token",
+                    "content": "No relevant documents found. Please upload some documents first."
+                })
+                yield _ndjson({
+                    "type": "done",
+                    "success": True,
+                    "message": "No documents found",
+                    "timings": {
+                        "retrieval_ms": round(retrieval_ms, 1),
+                        "total_ms": round((time.perf_counter() - start_time) * 1000, 1)
+                    }
+                })
+                return
+            
+            # Stream tokens as the chain yields them
+            context = results['context']
+            prompt = ChatPromptTemplate.from_template(
+                "Answer based on this context:\n{context}\nQuestion: {question}"
+            )
+            chain = prompt | llm | StrOutputParser()
+            
+            first_token_ms = None
+            token_count = 0
+            answer_parts = []
+            async for token in chain.astream({
+                "context": context,
+                "question": request.question
+            }):
+                if not token:
+                    continue
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start_time) * 1000
+                token_count += 1
+                answer_parts.append(token)
+                yield _ndjson({"type": "token", "content": token})
+            
+            answer = "".join(answer_parts)
+            answer_cache.put(
+                cache_key, answer, documents[:3], request.n_results,
+                query_embedding if where is None else None, results['citations'], generation
+            )
+            online_evaluator.maybe_submit(
+                request.question, answer, results['passages'], query_embedding, results['embeddings']
+            )
+            total_ms = (time.perf_counter() - start_time) * 1000
+            yield _ndjson({
+                "type": "done",
+                "success": True,
+                "timings": {
+                    "retrieval_ms": round(retrieval_ms, 1),
+                    "first_token_ms": round(first_token_ms, 1) if first_token_ms is not None else None,
+                    "generation_ms": round(total_ms - retrieval_ms, 1),
+                    "total_ms": round(total_ms, 1)
+                },
+                "token_count": token_count,
+                "retrieval": results['retrieval']
+            })
+        
+        except Exception as e:
+            logger.error(f"Error in streaming query: {str(e)}")
+            yield _ndjson({"type": "error", "success": False, "message": str(e)})
+        finally:
+            tenant.record_query((time.perf_counter() - start_time) * 1000)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Enhanced query endpoint that includes evaluation
 @app.post("/query_with_evaluation", response_model=Dict[str, Any])
-async def query_documents_with_evaluation(request: QueryRequest, ground_truth: Optional[str] = None):
+async def query_documents_with_evaluation(request: QueryRequest, ground_truth: Optional[str] = None,
+                                          bypass_cache: bool = False,
+                                          tenant: TenantHandle = Depends(current_tenant)):
     """Query documents and automatically evaluate the response"""
     if not all([embeddings, collection, llm, evaluator]):
         raise HTTPException(status_code=503, detail="Components not initialized")
     
+    start_time = time.perf_counter()
     try:
         # Query the collection
-        query_embedding = embeddings.embed_query(request.question)
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=request.n_results
+        query_embedding = await run_blocking("embed", embeddings.embed_query, request.question)
+        results = await retrieve_context(
+            tenant, request.question, query_embedding, request.n_results, query_filter(request)
         )
         
-        if not results['documents'][0]:
+        if not results['documents']:
             return {
                 "query_response": {
                     "answer": "No relevant documents found.",
@@ -290,29 +662,35 @@ async def query_documents_with_evaluation(request: QueryRequest, ground_truth: O
             }
         
         # Generate response
-        context = "\n\n".join(results['documents'][0])
+        context = results['context']
         prompt = ChatPromptTemplate.from_template(
             "Answer based on this context:\n{context}\nQuestion: {question}"
         )
         chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({
+        response = await run_blocking("llm", chain.invoke, {
             "context": context,
             "question": request.question
         })
+        # Judge time is excluded so tenant latency stays comparable across endpoints
+        tenant.record_query((time.perf_counter() - start_time) * 1000)
         
         # Prepare query response
         query_response = {
             "answer": response,
-            "sources": results['documents'][0][:3],
-            "success": True
+            "sources": results['documents'][:3],
+            "success": True,
+            "retrieval": results['retrieval'],
+            "citations": results['citations']
         }
         
         # Perform evaluation
-        evaluation_results = evaluator.evaluate_complete_rag(
+        evaluation_results = await run_blocking(
+            "eval", evaluator.evaluate_complete_rag,
             question=request.question,
             answer=response,
-            context=results['documents'][0],
-            ground_truth=ground_truth
+            context=results['passages'],
+            ground_truth=ground_truth,
+            use_cache=not bypass_cache
         )
         
         return {
@@ -327,16 +705,18 @@ async def query_documents_with_evaluation(request: QueryRequest, ground_truth: O
     
 # Individual evaluation endpoints
 @app.post("/evaluate/correctness", response_model=EvaluationResponse)
-async def evaluate_correctness(request: CorrectnessEvaluationRequest):
+async def evaluate_correctness(request: CorrectnessEvaluationRequest, bypass_cache: bool = False):
     """Evaluate answer correctness against ground truth"""
     if not evaluator:
         raise HTTPException(status_code=503, detail="Evaluator not initialized")
     
     try:
-        result = evaluator.evaluate_correctness(
+        result = await run_blocking(
+            "eval", evaluator.evaluate_correctness,
             question=request.question,
             student_answer=request.answer,
-            ground_truth=request.ground_truth
+            ground_truth=request.ground_truth,
+            use_cache=not bypass_cache
         )
         
         return EvaluationResponse(
@@ -349,15 +729,17 @@ async def evaluate_correctness(request: CorrectnessEvaluationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/evaluate/relevance", response_model=EvaluationResponse)
-async def evaluate_relevance(request: RelevanceEvaluationRequest):
+async def evaluate_relevance(request: RelevanceEvaluationRequest, bypass_cache: bool = False):
     """Evaluate answer relevance to the question"""
     if not evaluator:
         raise HTTPException(status_code=503, detail="Evaluator not initialized")
     
     try:
-        result = evaluator.evaluate_relevance(
+        result = await run_blocking(
+            "eval", evaluator.evaluate_relevance,
             question=request.question,
-            answer=request.answer
+            answer=request.answer,
+            use_cache=not bypass_cache
         )
         
         return EvaluationResponse(
@@ -370,15 +752,17 @@ async def evaluate_relevance(request: RelevanceEvaluationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/evaluate/groundedness", response_model=EvaluationResponse)
-async def evaluate_groundedness(request: GroundednessEvaluationRequest):
+async def evaluate_groundedness(request: GroundednessEvaluationRequest, bypass_cache: bool = False):
     """Evaluate answer groundedness in the context"""
     if not evaluator:
         raise HTTPException(status_code=503, detail="Evaluator not initialized")
     
     try:
-        result = evaluator.evaluate_groundedness(
+        result = await run_blocking(
+            "eval", evaluator.evaluate_groundedness,
             answer=request.answer,
-            context=request.context
+            context=request.context,
+            use_cache=not bypass_cache
         )
         
         return EvaluationResponse(
@@ -391,15 +775,17 @@ async def evaluate_groundedness(request: GroundednessEvaluationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/evaluate/retrieval_relevance", response_model=EvaluationResponse)
-async def evaluate_retrieval_relevance(request: RetrievalRelevanceEvaluationRequest):
+async def evaluate_retrieval_relevance(request: RetrievalRelevanceEvaluationRequest, bypass_cache: bool = False):
     """Evaluate retrieval relevance of documents to question"""
     if not evaluator:
         raise HTTPException(status_code=503, detail="Evaluator not initialized")
     
     try:
-        result = evaluator.evaluate_retrieval_relevance(
+        result = await run_blocking(
+            "eval", evaluator.evaluate_retrieval_relevance,
             question=request.question,
-            retrieved_docs=request.retrieved_docs
+            retrieved_docs=request.retrieved_docs,
+            use_cache=not bypass_cache
         )
         
         return EvaluationResponse(
@@ -412,17 +798,20 @@ async def evaluate_retrieval_relevance(request: RetrievalRelevanceEvaluationRequ
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/evaluate/complete", response_model=EvaluationResponse)
-async def evaluate_complete_rag(request: EvaluationRequest):
+async def evaluate_complete_rag(request: EvaluationRequest, bypass_cache: bool = False):
     """Perform complete RAG evaluation with all metrics"""
     if not evaluator:
         raise HTTPException(status_code=503, detail="Evaluator not initialized")
     
     try:
-        result = evaluator.evaluate_complete_rag(
+        result = await run_blocking(
+            "eval", evaluator.evaluate_complete_rag,
             question=request.question,
             answer=request.answer,
             context=request.context,
-            ground_truth=request.ground_truth
+            ground_truth=request.ground_truth,
+            mode=request.mode,
+            use_cache=not bypass_cache
         )
         
         return EvaluationResponse(
@@ -434,52 +823,125 @@ async def evaluate_complete_rag(request: EvaluationRequest):
         logger.error(f"Error in complete RAG evaluation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Batch evaluation endpoint
-@app.post("/evaluate/batch")
-async def batch_evaluate(requests: List[EvaluationRequest]):
-    """Perform batch evaluation on multiple requests"""
+@app.post("/evaluate/fast")
+async def evaluate_fast(requests: List[EvaluationRequest], policy: Optional[str] = None):
+    """Score a batch with the non-LLM tier only (overlap, ROUGE, embedding similarity)"""
     if not evaluator:
         raise HTTPException(status_code=503, detail="Evaluator not initialized")
     
     try:
-        results = []
-        for i, request in enumerate(requests):
-            logger.info(f"Processing batch evaluation {i+1}/{len(requests)}")
-            
-            evaluation_result = evaluator.evaluate_complete_rag(
-                question=request.question,
-                answer=request.answer,
-                context=request.context,
-                ground_truth=request.ground_truth
-            )
-            
-            results.append({
-                "request_id": i,
-                "question": request.question,
-                "evaluation": evaluation_result
-            })
-        
-        # Calculate batch statistics
-        overall_scores = [r["evaluation"]["overall_score"] for r in results]
-        batch_stats = {
-            "total_evaluations": len(results),
-            "average_score": sum(overall_scores) / len(overall_scores),
-            "min_score": min(overall_scores),
-            "max_score": max(overall_scores),
-            "scores": overall_scores
-        }
-        
+        result = await run_blocking(
+            "eval", evaluator.evaluate_fast, [request.dict() for request in requests], policy
+        )
         return {
             "success": True,
-            "batch_results": results,
-            "batch_statistics": batch_stats,
-            "message": f"Batch evaluation completed for {len(requests)} requests"
+            **result,
+            "message": f"Fast evaluation completed for {len(requests)} requests, {result['escalations']} would escalate"
         }
-        
     except Exception as e:
-        logger.error(f"Error in batch evaluation: {str(e)}")
+        logger.error(f"Error in fast evaluation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/evaluate/tiered", response_model=EvaluationResponse)
+async def evaluate_tiered(request: EvaluationRequest, policy: Optional[str] = None, bypass_cache: bool = False):
+    """Score with the fast tier and escalate to the LLM judge per the escalation policy"""
+    if not evaluator:
+        raise HTTPException(status_code=503, detail="Evaluator not initialized")
+    
+    try:
+        result = await run_blocking(
+            "eval", evaluator.evaluate_tiered,
+            question=request.question,
+            answer=request.answer,
+            context=request.context,
+            ground_truth=request.ground_truth,
+            mode=request.mode,
+            use_cache=not bypass_cache,
+            policy=policy
+        )
+        return EvaluationResponse(
+            success=True,
+            results=result,
+            message=f"Tiered evaluation completed ({result['tier']} tier). Overall score: {result['overall_score']:.2f}/5"
+        )
+    except Exception as e:
+        logger.error(f"Error in tiered evaluation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def run_online_evaluation(sample: Dict[str, Any]) -> Dict[str, Any]:
+    """Evaluate one sampled production answer off the request path"""
+    if not evaluator:
+        raise RuntimeError("Evaluator not initialized")
+    return await run_blocking(
+        "eval", evaluator.evaluate_tiered,
+        question=sample["question"],
+        answer=sample["answer"],
+        context=sample["context"],
+        question_embedding=sample["question_embedding"],
+        context_embeddings=sample.get("context_embeddings")
+    )
+
+@app.get("/evaluate/online")
+async def get_online_evaluation(limit: int = 12):
+    """Get sampling counters and rolling quality metrics per time window"""
+    return online_evaluator.get_stats(limit)
+
+# Batch evaluation endpoint
+@app.post("/evaluate/batch")
+async def batch_evaluate(requests: List[EvaluationRequest], batch_id: Optional[str] = None,
+                         concurrency: Optional[int] = None, bypass_cache: bool = False):
+    """Evaluate a batch concurrently and stream results as NDJSON events
+    
+    The batch is checkpointed to disk; posting the same requests again (or passing
+    the same batch_id) resumes an interrupted run instead of starting over.
+    """
+    if not evaluator:
+        raise HTTPException(status_code=503, detail="Evaluator not initialized")
+    
+    items = [request.dict() for request in requests]
+    batch_id = batch_id or make_batch_id(items)
+    try:
+        validate_batch_id(batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if batch_id in batch_engine.active:
+        raise HTTPException(status_code=409, detail=f"Batch {batch_id} is already running")
+    try:
+        await run_blocking("db", batch_engine.check_resumable, batch_id, items)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    async def evaluate(item: Dict[str, Any]) -> Dict[str, Any]:
+        return await run_blocking(
+            "eval", evaluator.evaluate_complete_rag, **item, use_cache=not bypass_cache
+        )
+    
+    async def event_stream():
+        try:
+            async for event in batch_engine.run(batch_id, items, evaluate, concurrency):
+                yield _ndjson(event)
+        except Exception as e:
+            logger.error(f"Error in batch evaluation: {str(e)}")
+            yield _ndjson({"type": "error", "success": False, "batch_id": batch_id, "message": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Batch-Id": batch_id}
+    )
+
+@app.get("/evaluate/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Get statistics for a checkpointed (possibly still running) batch"""
+    try:
+        validate_batch_id(batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    summary = await run_blocking("db", batch_engine.summarize, batch_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id, "batch_statistics": summary}
+
 # Health check for evaluator
 @app.get("/evaluator/health")
 async def evaluator_health():
@@ -490,8 +952,12 @@ async def evaluator_health():
             "evaluator_initialized": True,
             "model": "llama3",
             "available_evaluations": [
-                "correctness", "relevance", "groundedness", "retrieval_relevance", "complete"
-            ]
+                "correctness", "relevance", "groundedness", "retrieval_relevance", "complete",
+                "fast", "tiered"
+            ],
+            "usage": evaluator.get_usage(),
+            "parse_stats": evaluator.get_parse_stats(),
+            "tier_stats": evaluator.get_tier_stats()
         }
     else:
         return {
@@ -500,37 +966,110 @@ async def evaluator_health():
             "message": "Evaluator not initialized"
         }
 
+@app.get("/system/workers")
+async def get_worker_pools():
+    """Get worker pool sizes and current load"""
+    return {"pools": worker_pools.stats()}
+
+@app.get("/retrieval/stats")
+async def get_retrieval_stats(tenant: TenantHandle = Depends(current_tenant)):
+    """Get retrieval mode and the tenant's lexical index size"""
+    return {
+        "mode": RETRIEVAL_MODE,
+        "tenant": tenant.name,
+        "lexical_index": tenant.lexical_index.get_stats()
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats(tenant: TenantHandle = Depends(current_tenant)):
+    """Get answer (per tenant), embedding and evaluation cache hit/miss counters"""
+    return {
+        "tenant": tenant.name,
+        "answer_cache": tenant.answer_cache.get_stats(),
+        "embedding_cache": embedding_cache.get_stats() if embedding_cache else None,
+        "evaluation_cache": evaluation_cache.get_stats() if evaluation_cache else None
+    }
+
+@app.delete("/cache")
+async def clear_cache(tenant: TenantHandle = Depends(current_tenant)):
+    """Drop the tenant's cached answers"""
+    tenant.answer_cache.invalidate("manual clear")
+    return {"success": True, "message": "Answer cache cleared"}
+
+@app.delete("/cache/evaluations")
+async def clear_evaluation_cache():
+    """Drop all memoized judge results"""
+    if not evaluation_cache:
+        raise HTTPException(status_code=503, detail="Evaluation cache not initialized")
+    removed = await run_blocking("db", evaluation_cache.clear)
+    return {"success": True, "message": f"Evaluation cache cleared ({removed} entries)"}
+
+@app.get("/tenants")
+async def list_tenants():
+    """List known tenants and the open-handle LRU"""
+    if tenants is None:
+        raise HTTPException(status_code=503, detail="Backend components not initialized")
+    return {
+        "tenants": await run_blocking("db", tenants.list_tenants),
+        "handles": tenants.get_stats()
+    }
+
+@app.get("/tenants/{name}/stats")
+async def get_tenant_stats(name: str):
+    """Get a tenant's document count, index size and query latency"""
+    if tenants is None:
+        raise HTTPException(status_code=503, detail="Backend components not initialized")
+    # Stats never create a tenant as a side effect
+    if name not in await run_blocking("db", tenants.list_tenants):
+        raise HTTPException(status_code=404, detail=f"Tenant {name} not found")
+    tenant = await acquire_tenant(name)
+    try:
+        return await run_blocking("db", tenant.get_stats, embedding_dim)
+    finally:
+        tenants.release(tenant)
+
 @app.get("/agents/status")
 async def get_simple_agent_status():
     """Get simple agent status"""
     try:
         status = {}
+        queues = simple_bus.get_queue_stats()
         for name, info in simple_bus.agents.items():
             status[name] = {
                 "status": info["status"],
-                "message_count": len(info["messages"])
+                "message_count": len(info["messages"]),
+                "queue": queues[name]
             }
         
         return {
             "agents": status,
-            "shared_data_keys": list(simple_bus.shared_data.keys())
+            "shared_data_keys": simple_bus.shared_data.keys(),
+            "shared_data": simple_bus.shared_data.get_stats()
         }
     except Exception as e:
         logger.error(f"Error getting agent status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/agents/shared_data")
-async def get_shared_data():
-    """Get all shared data"""
+async def get_shared_data(prefix: str = "", offset: int = 0, limit: int = 50):
+    """Get shared data, newest first, paginated and filtered by key prefix"""
     try:
+        page = simple_bus.shared_data.page(prefix, offset, limit)
         data = {}
-        for key, info in simple_bus.shared_data.items():
+        for key, info in page["items"]:
             data[key] = {
                 "value": info["value"],
                 "updated_by": info["updated_by"],
-                "timestamp": info["timestamp"].isoformat()
+                "timestamp": info["timestamp"].isoformat(),
+                "summarized": info["summarized"],
+                "original_bytes": info["original_size"]
             }
-        return {"shared_data": data}
+        return {
+            "shared_data": data,
+            "total": page["total"],
+            "offset": offset,
+            "limit": limit
+        }
     except Exception as e:
         logger.error(f"Error getting shared data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -557,17 +1096,17 @@ async def get_recent_activities(limit: int = 20):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/clear")
-async def clear_database():
-    """Clear all documents from the database"""
-    if not collection:
-        raise HTTPException(status_code=503, detail="Database not initialized")
+async def clear_database(tenant: TenantHandle = Depends(current_tenant)):
+    """Clear all of the tenant's documents from the database"""
     try:
         # Get all document IDs
-        all_ids = collection.get()['ids']
+        all_ids = (await run_blocking("db", tenant.collection.get, include=[]))['ids']
+        await run_blocking("db", tenant.lexical_index.clear)
         if all_ids:
             # Delete all documents from collection
-            collection.delete(ids=all_ids)
-            logger.info(f"Cleared {len(all_ids)} documents from database")
+            await run_blocking("db", tenant.collection.delete, ids=all_ids)
+            tenant.answer_cache.invalidate("collection cleared")
+            logger.info(f"Cleared {len(all_ids)} documents from tenant '{tenant.name}'")
             return {"success": True, "message": f"Cleared {len(all_ids)} documents"}
         return {"success": True, "message": "Database was already empty"}
     except Exception as e:
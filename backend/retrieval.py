@@ -0,0 +1,266 @@
+import asyncio
+import os
+from datetime import datetime
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from concurrency import run_blocking
+from context_builder import estimate_tokens
+
+# "hybrid" fuses BM25 and dense rankings; "dense" uses the vector index only
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+# Candidates taken from each ranking before fusion, and the RRF rank constant
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+# Over-fetch depth for reranking (0 disables it) and the MMR relevance/diversity trade-off
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+# Candidates at least this similar to an already selected chunk are skipped outright
+MMR_DUPLICATE_SIMILARITY = float(os.getenv("RAG_MMR_DUPLICATE_SIMILARITY", "0.97"))
+# Optional local cross-encoder (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2); empty disables it
+RERANKER_MODEL = os.getenv("RAG_RERANKER_MODEL", "")
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Merge ranked id lists by summing 1 / (k + rank) per id, best first"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def build_where(sources: Optional[List[str]] = None, doc_types: Optional[List[str]] = None,
+                ingested_after: Optional[datetime] = None,
+                ingested_before: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """Chroma metadata filter for the given scope, or None for the whole collection"""
+    clauses: List[Dict[str, Any]] = []
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    if doc_types:
+        clauses.append({"doc_type": {"$in": list(doc_types)}})
+    if ingested_after:
+        clauses.append({"ingested_at": {"$gte": ingested_after.timestamp()}})
+    if ingested_before:
+        clauses.append({"ingested_at": {"$lte": ingested_before.timestamp()}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def make_citations(ids: List[str], metadatas: List[Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """One citation per distinct source page, in rank order; pages are 1-based"""
+    citations, seen = [], set()
+    for chunk_id, metadata in zip(ids, metadatas):
+        metadata = metadata or {}
+        key = (metadata.get("source"), metadata.get("page"))
+        if key in seen:
+            continue
+        seen.add(key)
+        citation = {"source": metadata.get("source"), "chunk_id": chunk_id}
+        if metadata.get("page") is not None:
+            citation["page"] = metadata["page"] + 1
+        if metadata.get("doc_type"):
+            citation["doc_type"] = metadata["doc_type"]
+        if metadata.get("ingested_at"):
+            citation["ingested_at"] = datetime.fromtimestamp(metadata["ingested_at"]).isoformat()
+        citations.append(citation)
+    return citations
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def _min_max(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+def maximal_marginal_relevance(query_embedding: List[float], embeddings: np.ndarray, k: int,
+                               lambda_mult: float = MMR_LAMBDA,
+                               relevance: Optional[np.ndarray] = None,
+                               duplicate_similarity: float = MMR_DUPLICATE_SIMILARITY) -> List[int]:
+    """Greedy MMR selection of up to k candidate indices
+
+    The candidate similarity matrix is computed once; each step only updates the
+    running max similarity to the selected set. Relevance defaults to cosine
+    similarity with the query and is rescaled to [0, 1]. Near-duplicates of a
+    selected candidate are never picked, so fewer than k may be returned.
+    """
+    matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+    if relevance is None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        relevance = matrix @ (query / (np.linalg.norm(query) or 1))
+    relevance = _min_max(np.asarray(relevance, dtype=np.float32))
+    similarity = matrix @ matrix.T
+
+    k = min(k, len(matrix))
+    if k <= 0:
+        return []
+    first = int(np.argmax(relevance))
+    selected = [first]
+    available = np.ones(len(matrix), dtype=bool)
+    available[first] = False
+    available &= similarity[first] < duplicate_similarity
+    max_similarity = similarity[first].copy()
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        available &= similarity[best] < duplicate_similarity
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+class CrossEncoderReranker:
+    """Optional local CPU cross-encoder, loaded on first use"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None and not self._failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    logger.info(f"Loaded reranker {self.model_name}")
+                except Exception as e:
+                    self._failed = True
+                    logger.warning(f"Reranker {self.model_name} unavailable, using MMR only: {e}")
+        return self._model
+
+    def score(self, question: str, documents: List[str]) -> Optional[np.ndarray]:
+        """Relevance score per document, or None if the model cannot be loaded"""
+        model = self._load()
+        if model is None:
+            return None
+        return np.asarray(model.predict([(question, document) for document in documents]), dtype=np.float32)
+
+reranker = CrossEncoderReranker(RERANKER_MODEL) if RERANKER_MODEL else None
+
+async def _dense_candidates(collection, query_embedding: List[float], depth: int,
+                            where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    results = await run_blocking(
+        "db", collection.query,
+        query_embeddings=[query_embedding],
+        n_results=depth,
+        where=where,
+        include=["documents", "metadatas", "embeddings"]
+    )
+    return {
+        "ids": results["ids"][0],
+        "documents": results["documents"][0],
+        "metadatas": results["metadatas"][0],
+        "embeddings": list(results["embeddings"][0]) if results["ids"][0] else []
+    }
+
+async def _hybrid_candidates(collection, lexical_index, question: str, query_embedding: List[float],
+                             depth: int, limit: int, where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # The BM25 index holds no metadata, so a scoped search digs deeper and filters after
+    lexical_depth = depth * 4 if where else depth
+    dense, lexical = await asyncio.gather(
+        _dense_candidates(collection, query_embedding, depth, where),
+        run_blocking("db", lexical_index.search, question, lexical_depth)
+    )
+    lexical_ids = [chunk_id for chunk_id, _ in lexical]
+    if where and lexical_ids:
+        in_scope = await run_blocking("db", collection.get, ids=lexical_ids, where=where, include=[])
+        allowed = set(in_scope["ids"])
+        lexical_ids = [chunk_id for chunk_id in lexical_ids if chunk_id in allowed][:depth]
+    rows = {
+        chunk_id: row
+        for chunk_id, *row in zip(dense["ids"], dense["documents"], dense["metadatas"], dense["embeddings"])
+    }
+
+    fused = reciprocal_rank_fusion([dense["ids"], lexical_ids])[:limit]
+    missing = [chunk_id for chunk_id, _ in fused if chunk_id not in rows]
+    if missing:
+        fetched = await run_blocking(
+            "db", collection.get, ids=missing, include=["documents", "metadatas", "embeddings"]
+        )
+        rows.update({
+            chunk_id: row
+            for chunk_id, *row in zip(fetched["ids"], fetched["documents"], fetched["metadatas"], fetched["embeddings"])
+        })
+    # Skip ids the index still holds but the collection no longer has
+    fused = [(chunk_id, score) for chunk_id, score in fused if chunk_id in rows]
+
+    dense_set = set(dense["ids"])
+    lexical_set = set(lexical_ids)
+    return {
+        "ids": [chunk_id for chunk_id, _ in fused],
+        "documents": [rows[chunk_id][0] for chunk_id, _ in fused],
+        "metadatas": [rows[chunk_id][1] for chunk_id, _ in fused],
+        "embeddings": [rows[chunk_id][2] for chunk_id, _ in fused],
+        "scores": [score for _, score in fused],
+        "stats": {
+            "dense_candidates": len(dense["ids"]),
+            "lexical_candidates": len(lexical_ids),
+            "lexical_only": sum(1 for chunk_id, _ in fused if chunk_id not in dense_set),
+            "dense_only": sum(1 for chunk_id, _ in fused if chunk_id not in lexical_set)
+        }
+    }
+
+async def retrieve(collection, lexical_index, question: str, query_embedding: List[float],
+                   n_results: int, mode: Optional[str] = None,
+                   candidates: int = HYBRID_CANDIDATES,
+                   rerank_candidates: int = RERANK_CANDIDATES,
+                   where: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Retrieve and rerank the context chunks for a question
+
+    Stage one over-fetches up to `rerank_candidates` chunks, fusing the dense and
+    BM25 rankings with RRF in hybrid mode. Stage two scores them with the
+    cross-encoder if one is configured, then picks `n_results` with MMR over the
+    embeddings Chroma already returned, so overlapping neighbour chunks do not
+    crowd out other evidence. `baseline_tokens` is the size of the raw top
+    `n_results` candidates, for reporting what the context builder saved. A
+    `where` filter (see build_where) scopes both rankings to matching chunks.
+    The selected chunks' embeddings are returned too, for evaluation to reuse.
+    """
+    mode = mode or RETRIEVAL_MODE
+    fetch = max(n_results, rerank_candidates)
+    if mode == "hybrid" and lexical_index is not None:
+        pool = await _hybrid_candidates(
+            collection, lexical_index, question, query_embedding, max(fetch, candidates), fetch, where
+        )
+    else:
+        mode = "dense"
+        pool = await _dense_candidates(collection, query_embedding, fetch, where)
+        pool["scores"] = None
+        pool["stats"] = {}
+
+    stats: Dict[str, Any] = {"mode": mode, "candidates": len(pool["ids"]), **pool["stats"]}
+    if where:
+        stats["filter"] = where
+    if not pool["ids"]:
+        stats.update({"reranked_by": [], "baseline_tokens": 0})
+        return {"ids": [], "documents": [], "metadatas": [], "embeddings": [], "retrieval": stats}
+
+    order = list(range(min(n_results, len(pool["ids"]))))
+    reranked_by = []
+    if len(pool["ids"]) > n_results:
+        relevance = np.asarray(pool["scores"], dtype=np.float32) if pool["scores"] is not None else None
+        if reranker is not None:
+            scores = await run_blocking("embed", reranker.score, question, pool["documents"])
+            if scores is not None:
+                relevance = scores
+                reranked_by.append("cross_encoder")
+        # A few dozen candidates: cheaper inline than a thread hop
+        order = maximal_marginal_relevance(
+            query_embedding, np.asarray(pool["embeddings"], dtype=np.float32), n_results,
+            relevance=relevance
+        )
+        reranked_by.append("mmr")
+
+    stats["reranked_by"] = reranked_by
+    stats["baseline_tokens"] = sum(estimate_tokens(document) for document in pool["documents"][:n_results])
+    return {
+        "ids": [pool["ids"][index] for index in order],
+        "documents": [pool["documents"][index] for index in order],
+        "metadatas": [pool["metadatas"][index] for index in order],
+        "embeddings": [pool["embeddings"][index] for index in order],
+        "retrieval": stats
+    }
@@ -0,0 +1,274 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+import numpy as np
+from loguru import logger
+from answer_cache import AnswerCache, answer_cache, create_answer_cache
+from lexical_index import BM25Index, create_lexical_index
+
+# Tenant used when a request names none; it keeps the original collection and index files
+DEFAULT_TENANT = os.getenv("RAG_DEFAULT_TENANT", "default")
+# Open tenant handles kept in memory; the least recently used unpinned one is closed past this
+MAX_OPEN_TENANTS = int(os.getenv("RAG_MAX_OPEN_TENANTS", "64"))
+# Directory holding the per-tenant BM25 index files
+TENANT_INDEX_DIR = os.getenv("RAG_TENANT_INDEX_DIR", "tenant_indexes")
+# Recent query latencies kept per tenant for its stats
+TENANT_LATENCY_WINDOW = int(os.getenv("RAG_TENANT_LATENCY_WINDOW", "1000"))
+
+TENANT_HEADER = "X-Tenant-ID"
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,39}$")
+
+def validate_tenant(name: str) -> str:
+    """Return the tenant name, raising ValueError if it is not a safe identifier"""
+    if not _TENANT_RE.match(name or ""):
+        raise ValueError(
+            f"Invalid tenant '{name}': use 1-40 letters, digits, '-' or '_', starting with a letter or digit"
+        )
+    return name
+
+class TenantHandle:
+    """Open collection, lexical index and answer cache of one tenant"""
+
+    def __init__(self, name: str, collection, lexical_index: BM25Index, answer_cache: AnswerCache,
+                 latency_window: int = TENANT_LATENCY_WINDOW):
+        self.name = name
+        self.collection = collection
+        self.lexical_index = lexical_index
+        self.answer_cache = answer_cache
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.queries = 0
+        self.opened_at = time.time()
+        self.last_used = self.opened_at
+        # Requests and jobs currently using the handle; changed only under the registry lock
+        self.pins = 0
+
+    def close(self):
+        """Release the lexical index and cached answers; the tenant's data stays on disk"""
+        self.lexical_index.close()
+        self.answer_cache.invalidate("tenant closed")
+
+    def record_query(self, latency_ms: float):
+        """Record the end-to-end latency of one query"""
+        self.queries += 1
+        self.latencies.append(latency_ms)
+
+    def get_stats(self, embedding_dim: int) -> Dict[str, Any]:
+        """Document count, approximate index size and recent query latency"""
+        documents = self.collection.count()
+        lexical_bytes = sum(
+            os.path.getsize(path)
+            for path in (self.lexical_index.path, self.lexical_index.path + "-wal")
+            if os.path.exists(path)
+        )
+        latency = None
+        if self.latencies:
+            values = np.asarray(self.latencies, dtype=np.float64)
+            latency = {
+                "samples": len(values),
+                "mean": round(float(values.mean()), 2),
+                "p50": round(float(np.percentile(values, 50)), 2),
+                "p95": round(float(np.percentile(values, 95)), 2),
+                "max": round(float(values.max()), 2)
+            }
+        return {
+            "tenant": self.name,
+            "collection": self.collection.name,
+            "documents": documents,
+            "index_size": {
+                # float32 vectors only; HNSW graph and metadata overhead come on top
+                "vector_bytes": documents * embedding_dim * 4,
+                "lexical_bytes": lexical_bytes,
+                "lexical_terms": self.lexical_index.get_stats()["terms"]
+            },
+            "queries": self.queries,
+            "latency_ms": latency,
+            "answer_cache_entries": self.answer_cache.get_stats()["entries"],
+            "opened_at": self.opened_at,
+            "last_used": self.last_used
+        }
+
+class TenantRegistry:
+    """Per-tenant collections opened lazily and kept in a bounded LRU
+
+    Each tenant gets its own Chroma collection, BM25 index file and answer cache,
+    so retrieval, caching and clearing never cross tenants. Handles are opened on
+    first use, once: concurrent first requests wait for the same open. Every user
+    pins the handle (acquire/release); past `max_open` the least recently used
+    unpinned handle is dropped, so a tenant never has two live handles over its
+    index file. Eviction frees the BM25 postings and answer cache, not the data,
+    and not the memory Chroma itself holds for the collection.
+    """
+
+    def __init__(self, client, base_name: str, embedding_dim: int,
+                 max_open: int = MAX_OPEN_TENANTS, index_dir: str = TENANT_INDEX_DIR,
+                 default_tenant: str = DEFAULT_TENANT):
+        self.client = client
+        self.base_name = base_name
+        self.embedding_dim = embedding_dim
+        self.max_open = max(1, max_open)
+        self.index_dir = index_dir
+        self.default_tenant = validate_tenant(default_tenant)
+        self._handles: "OrderedDict[str, TenantHandle]" = OrderedDict()
+        self._opening: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "evicted": 0, "hits": 0}
+        os.makedirs(index_dir, exist_ok=True)
+
+    def collection_name(self, tenant: str) -> str:
+        """Chroma collection backing a tenant"""
+        if tenant == self.default_tenant:
+            return self.base_name
+        return f"t_{tenant}_{self.base_name}"
+
+    def _open(self, tenant: str) -> TenantHandle:
+        collection = self.client.get_or_create_collection(name=self.collection_name(tenant))
+        if tenant == self.default_tenant:
+            lexical_index = create_lexical_index()
+            cache = answer_cache
+        else:
+            lexical_index = create_lexical_index(os.path.join(self.index_dir, f"{tenant}.sqlite3"))
+            cache = create_answer_cache()
+        lexical_index.sync(collection)
+        logger.info(f"Opened tenant '{tenant}' ({collection.name})")
+        return TenantHandle(tenant, collection, lexical_index, cache)
+
+    def _pin(self, handle: TenantHandle) -> TenantHandle:
+        self._handles.move_to_end(handle.name)
+        handle.pins += 1
+        handle.last_used = time.time()
+        return handle
+
+    def acquire(self, tenant: Optional[str] = None) -> TenantHandle:
+        """Pinned handle for a tenant, opening it if needed; pair with release()"""
+        tenant = validate_tenant(tenant or self.default_tenant)
+        while True:
+            with self._lock:
+                handle = self._handles.get(tenant)
+                if handle is not None:
+                    self.counters["hits"] += 1
+                    return self._pin(handle)
+                opening = self._opening.get(tenant)
+                owner = opening is None
+                if owner:
+                    opening = self._opening[tenant] = Future()
+            if not owner:
+                # Another request is opening this tenant; wait for it, then look again
+                opening.result()
+                continue
+
+            # Other tenants are not blocked while this one loads its index
+            try:
+                handle = self._open(tenant)
+            except BaseException as e:
+                with self._lock:
+                    del self._opening[tenant]
+                opening.set_exception(e)
+                raise
+            with self._lock:
+                del self._opening[tenant]
+                self._handles[tenant] = handle
+                self.counters["opened"] += 1
+                self._pin(handle)
+                evicted = self._evict()
+            opening.set_result(handle)
+            self._close(evicted)
+            return handle
+
+    def release(self, handle: TenantHandle):
+        """Unpin a handle from acquire(), closing idle handles past the limit"""
+        with self._lock:
+            handle.pins -= 1
+            evicted = self._evict()
+        self._close(evicted)
+
+    @contextmanager
+    def use(self, tenant: Optional[str] = None):
+        """Pinned handle for the duration of a block"""
+        handle = self.acquire(tenant)
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def _evict(self) -> List[TenantHandle]:
+        # The default tenant and pinned handles are never evicted; the caller
+        # closes the returned handles once it has released the lock
+        evicted = []
+        while len(self._handles) > self.max_open:
+            victim = next(
+                (name for name, handle in self._handles.items()
+                 if name != self.default_tenant and handle.pins == 0),
+                None
+            )
+            if victim is None:
+                break
+            evicted.append(self._handles.pop(victim))
+            self.counters["evicted"] += 1
+            logger.debug(f"Evicted tenant '{victim}' from open handles")
+        return evicted
+
+    @staticmethod
+    def _close(handles: List[TenantHandle]):
+        for handle in handles:
+            try:
+                handle.close()
+            except Exception as e:
+                logger.warning(f"Failed to close tenant '{handle.name}': {e}")
+
+    def close(self):
+        """Close every open handle, e.g. on shutdown"""
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        self._close(handles)
+
+    def list_tenants(self) -> List[str]:
+        """Every tenant with a collection, open or not"""
+        names = [getattr(collection, "name", collection) for collection in self.client.list_collections()]
+        prefix, suffix = "t_", f"_{self.base_name}"
+        tenants = {
+            name[len(prefix):-len(suffix)]
+            for name in names
+            if name.startswith(prefix) and name.endswith(suffix)
+        }
+        if self.base_name in names:
+            tenants.add(self.default_tenant)
+        return sorted(tenants)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Open handle counts and LRU counters"""
+        with self._lock:
+            open_tenants = list(self._handles)
+            opening = len(self._opening)
+        return {
+            **self.counters,
+            "open": len(open_tenants),
+            "opening": opening,
+            "max_open": self.max_open,
+            "open_tenants": open_tenants
+        }
+
+class TenantPathMiddleware:
+    """Serve /t/{tenant}/<endpoint> as /<endpoint> with the tenant passed in the X-Tenant-ID header"""
+
+    def __init__(self, app, prefix: str = "/t"):
+        self.app = app
+        self.prefix = prefix.rstrip("/") + "/"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            tenant, _, rest = scope["path"][len(self.prefix):].partition("/")
+            if tenant and rest:
+                header = TENANT_HEADER.lower().encode()
+                scope = dict(scope)
+                scope["path"] = "/" + rest
+                scope["raw_path"] = scope["path"].encode()
+                scope["headers"] = [
+                    (key, value) for key, value in scope["headers"] if key != header
+                ] + [(header, tenant.encode())]
+        await self.app(scope, receive, send)